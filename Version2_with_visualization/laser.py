@@ -11,6 +11,18 @@ class Laser:
         self.coordinates = [start]
         self.refract = False
         self.edge = 0
+        self.state = None
+
+    def follow(self, state, table):
+        """
+        Move to a TransitionTable state. Table points are (column, row),
+        the reverse of this class's (x, y).
+        """
+        col, row = table.points[state]
+        self.dy, self.dx = table.direction(state)
+        self.x, self.y = row, col
+        self.coordinates.append((self.x, self.y))
+        self.state = state
 
     def movelaser(self):
         self.x += self.dx
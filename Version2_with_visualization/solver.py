@@ -1,11 +1,20 @@
+import os
+import sys
+
 from laser import Laser
-from file_reader import Locations
 
-from itertools import permutations, combinations
 import numpy as np
 from visualizer import visualize_puzzle
 
-def solve_maze(customGrid, initialPositions, laserPath, goalPositions, blockingCell):
+# The candidate generator is shared with the top-level solver
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from lazor_candidates import iter_placements
+from lazor_board import Board, CODES, OPEN
+from lazor_reach import split_open_cells
+from lazor_table import TransitionTable, EDGE
+from lazor_trace import trace_beams
+
+def solve_maze(customGrid, initialPositions, laserPath, goalPositions, blockingCell, table=None):
     """
     Simulates the movement of lasers on the grid and determines whether
     the target configuration can be achieved.
@@ -15,7 +24,9 @@ def solve_maze(customGrid, initialPositions, laserPath, goalPositions, blockingC
         initialPositions (list of tuple of int): Coordinates of the lasers.
         laserPath (list of tuple of int): Direction vectors for each laser.
         goalPositions (list of tuple of int): Target points that lasers must hit.
-        blockingCell (int): Number of refractive blocks (C blocks) present.
+        blockingCell (int): Number of refractive blocks (C blocks) present. No
+            longer needed to bound the search; kept for existing callers.
+        table (TransitionTable): Precomputed beam moves for this board size (built if omitted).
 
     Returns:
         final_list_of_lasers (list of Laser objects): The laser objects after simulation.
@@ -23,126 +34,79 @@ def solve_maze(customGrid, initialPositions, laserPath, goalPositions, blockingC
     """
 
     final_list_of_lasers = []  # list of lasers that work
-    list_of_lasers = []  # initialize laser possibilities
-    num_lasers = len(initialPositions)
-    num_refract_lasers = 0  # Initialize number of refracted lasers
-    max_pos = 10 * max(customGrid.shape) ** 2  # Maximum number of positions allowed for a laser
-    max_refract = num_lasers * blockingCell * max(customGrid.shape)  # prevent infinite loop
-
-    # Initialize lasers
-    for i in range(num_lasers):
-        list_of_lasers.append(Laser(initialPositions[i], laserPath[i]))
-
-    while len(list_of_lasers) > 0:
-        current_laser = list_of_lasers[0]
-
-        laserOB = current_laser.OutsideBoundary(customGrid.shape)
-        constrained_laser = len(current_laser.coordinates) > max_pos
-        laser_stuck_refract = num_refract_lasers > max_refract
-
-        # Break if the laser is constrained or refracted laser limit is reached
-        if constrained_laser or laser_stuck_refract:
-            break
 
-        if laserOB:
-            final_list_of_lasers.append(list_of_lasers.pop(0))
+    # Beam moves are looked up in a table built once per board size; table
+    # points are (column, row) while this module works in (row, column).
+    rows, cols = customGrid.shape
+    width, height = cols // 2, rows // 2
+    if table is None:
+        table = TransitionTable(width, height, physics=EDGE)
+    cells = [CODES.get(customGrid[2 * cy + 1, 2 * cx + 1], OPEN)
+             for cy in range(height) for cx in range(width)]
+
+    # Initialize lasers; one that starts off the lattice goes nowhere
+    starts, start_lasers = [], []
+    for i in range(len(initialPositions)):
+        laser = Laser(initialPositions[i], laserPath[i])
+        laser.state = table.state(laser.y, laser.x, (laser.dy, laser.dx))
+        if laser.state is None:
+            final_list_of_lasers.append(laser)
         else:
-            # Determine edge type (0 for vertical, 1 for horizontal)
-            current_laser.edge = 0 if current_laser.x % 2 == 1 else 1 if current_laser.y % 2 == 1 else current_laser.edge
-
-            # Determine the position of the block in the laser's path
-            if current_laser.edge == 0:  # Vertical edge
-                xBlock = current_laser.x
-                yBlock = current_laser.y + 1 if current_laser.dy == 1 else current_laser.y - 1
-            else:  # Horizontal edge
-                yBlock = current_laser.y
-                xBlock = current_laser.x + 1 if current_laser.dx == 1 else current_laser.x - 1
-
-            # Check bounds for block position
-            if not (0 <= xBlock < customGrid.shape[0] and 0 <= yBlock < customGrid.shape[1]):
-                current_laser.movelaser()
-                continue
-
-            block = customGrid[xBlock, yBlock]
-
-            if block == 'A':
-                # Reflect block
-                if current_laser.edge == 0:  # Vertical edge
-                    current_laser.dy = -current_laser.dy
-                else:  # Horizontal edge
-                    current_laser.dx = -current_laser.dx
-
-                # Check if laser hits another reflect block immediately
-                xNew, yNew = current_laser.x, current_laser.y
-                if (0 <= xNew < customGrid.shape[0] and 0 <= yNew < customGrid.shape[1] and
-                        customGrid[xNew, yNew] == 'A'):
-                    # Stop laser if between reflect blocks
-                    final_list_of_lasers.append(list_of_lasers.pop(0))
-                else:
-                    # Move laser
-                    current_laser.movelaser()
-
-            elif block == 'C':
-                # Refraction block - one beam continues, one beam reflects
-                num_refract_lasers += 1
-
-                # Create reflected beam (copy of current laser)
-                reflected_laser = Laser((current_laser.x, current_laser.y),
-                                        (current_laser.dx, current_laser.dy))
-                reflected_laser.refract = True
-                reflected_laser.edge = current_laser.edge
-
-                # Apply reflection to the new beam
-                if reflected_laser.edge == 0:  # Vertical edge
-                    reflected_laser.dy = -reflected_laser.dy
-                else:  # Horizontal edge
-                    reflected_laser.dx = -reflected_laser.dx
-
-                # Move both beams
-                reflected_laser.movelaser()
-                current_laser.movelaser()
-
-                # Add reflected beam to the list
-                list_of_lasers.append(reflected_laser)
-
-            elif block == 'B':
-                # Opaque block - stop laser
-                final_list_of_lasers.append(list_of_lasers.pop(0))
-
-            elif block in ['x', 'o', 0]:
-                # Empty space - move laser
-                current_laser.movelaser()
-            else:
-                # Unknown block type - move laser
-                current_laser.movelaser()
-
-    # Collect all positions from all lasers
-    allPositions = []
+            starts.append((None, laser.state))
+            start_lasers.append(laser)
+
+    # Trace every beam with the shared engine: each position and direction
+    # is followed once, so looping and refracted beams always finish.
+    for beam in trace_beams(table, cells, starts).beams:
+        if beam.origin is None:
+            laser = start_lasers[beam.lazor]
+            next_states = beam.states[1:]
+        else:
+            # Refracted copy, starting where it split off
+            col, row = beam.origin
+            dy, dx = table.direction(beam.states[0])
+            laser = Laser((row, col), (dx, dy))
+            laser.refract = True
+            next_states = beam.states
+        for state in next_states:
+            laser.follow(state, table)
+        final_list_of_lasers.append(laser)
+
+    # Collect all positions from all lasers (a set, for constant-time lookups)
+    allPositions = set()
     for finishedLaser in final_list_of_lasers:
-        allPositions.extend(finishedLaser.coordinates)
-
-    # Remove duplicates
-    allPositions = list(set(allPositions))
+        allPositions.update(finishedLaser.coordinates)
 
     # Check if all goal positions are hit
     solution = all(p in allPositions for p in goalPositions)
     return final_list_of_lasers, solution
 
-def solution(fptr):
-    from file_reader import readbff
-    meshGrid, blocks, laserData, checkpoints = readbff(fptr)
+def reachable_locations(meshGrid, laserPoints, laserDirs, blockCounts, table):
     """
-    Reads a .bff file, simulates laser movement on the grid, and determines 
-    whether a solution exists using the `solve_maze` function.
-
-    Parameters:
-        fptr (str): Path to the .bff file to read.
+    Split the open locations of meshGrid into those a laser could reach
+    with some arrangement of the blocks and those it never can, where it
+    makes no difference which block goes (see lazor_reach.split_open_cells).
 
     Returns:
-        solution_grid (ndarray): The grid configuration that solves the puzzle.
-        solution_lasers (list of Laser objects): The lasers and their traversed paths in the solution.
-        checkpoints (list of tuple of int): Coordinates of target points that must be hit.
+        allowed (list of tuple of int): Reachable open locations.
+        parking (list of tuple of int): The other open locations.
+    """
+    board = Board(table.width, table.height)
+    board.cells[:] = bytes(CODES.get(meshGrid[2 * cy + 1, 2 * cx + 1], OPEN)
+                           for cy in range(table.height) for cx in range(table.width))
+    # Same start states as solve_maze
+    starts = [table.state(p[1], p[0], (d[1], d[0])) for p, d in zip(laserPoints, laserDirs)]
+    relevant, parking = split_open_cells(board, [], blockCounts, table,
+                                         [s for s in starts if s is not None])
+    return ([(2 * cy + 1, 2 * cx + 1) for cx, cy in relevant],
+            [(2 * cy + 1, 2 * cx + 1) for cx, cy in parking])
+
+def _read_puzzle(fptr):
+    """
+    Reads a .bff file into the grid, block counts, lasers and targets the
+    solver works with, plus the beam table for the board's size.
     """
+    from file_reader import readbff
     meshGrid, blocks, laserData, checkpoints = readbff(fptr)
     # Transpose of checkpoints
     checkpoints = [i[::-1] for i in checkpoints]
@@ -153,33 +117,71 @@ def solution(fptr):
     laserDirs = laserData['laser_dir']
     laserDirs = [i[::-1] for i in laserDirs]
 
-    # Possible blocks
-    blockValues = ['A', 'B', 'C']
-    blockList = []
-    for i in range(3):
-        for j in range(blocks[i]):
-            blockList.append(blockValues[i])
+    # Each distinct arrangement of the (interchangeable) blocks, generated lazily
+    blockCounts = {'A': blocks[0], 'B': blocks[1], 'C': blocks[2]}
+
+    # Beam moves depend only on the board size, so share one table
+    table = TransitionTable(meshGrid.shape[1] // 2, meshGrid.shape[0] // 2, physics=EDGE)
+    return meshGrid, blockCounts, laserPoints, laserDirs, checkpoints, table
 
-    # Permuted block list
-    permutedBlockList = [list(p) for p in set(permutations(blockList))] if blockList else None
 
-    # Allowed locations
-    allowedLocations = Locations(meshGrid, 'o')
+def _solutions(meshGrid, blockCounts, laserPoints, laserDirs, checkpoints, table):
+    # Allowed locations: only cells some beam could reach get every
+    # arrangement, leftover blocks are parked in the others
+    allowedLocations, parkingLocations = reachable_locations(
+        meshGrid, laserPoints, laserDirs, blockCounts, table)
 
-    # Combination of allowed locations
-    locationCombinations = [list(c) for c in combinations(allowedLocations, sum(blocks))]
     # Fill grid and solve
-    for i in range(len(locationCombinations)):
-        for j in range(len(permutedBlockList)):
-            newGrid = meshGrid.copy()
-            for k in range(sum(blocks)):
-                newGrid[locationCombinations[i][k]] = permutedBlockList[j][k]
-            traversedLaser, solutionValue = solve_maze(newGrid, laserPoints, laserDirs, checkpoints, blocks[2])
-            if solutionValue:
-                # Solution grid
-                solution_grid = newGrid
-                solution_lasers = traversedLaser
-                break
+    for placement in iter_placements(allowedLocations, blockCounts, parking=parkingLocations):
+        newGrid = meshGrid.copy()
+        for location, block in placement:
+            newGrid[location] = block
+        traversedLaser, solutionValue = solve_maze(newGrid, laserPoints, laserDirs, checkpoints,
+                                                   blockCounts['C'], table)
+        if solutionValue:
+            yield newGrid, traversedLaser
+
+
+def iter_solutions(fptr):
+    """
+    Yields every grid configuration that solves a .bff file, as it is found.
+    Blocks that no laser can reach are always parked the same way, so
+    configurations differing only in where those sit are yielded once.
+
+    Parameters:
+        fptr (str): Path to the .bff file to read.
+
+    Yields:
+        solution_grid (ndarray): A grid configuration that solves the puzzle.
+        solution_lasers (list of Laser objects): The lasers and their traversed paths in it.
+    """
+    yield from _solutions(*_read_puzzle(fptr))
+
+
+def solution(fptr):
+    """
+    Reads a .bff file, simulates laser movement on the grid, and determines 
+    whether a solution exists using the `solve_maze` function.
+
+    Parameters:
+        fptr (str): Path to the .bff file to read.
+
+    Returns:
+        solution_grid (ndarray): The grid configuration that solves the puzzle.
+        solution_lasers (list of Laser objects): The lasers and their traversed paths in the solution.
+        checkpoints (list of tuple of int): Coordinates of target points that must be hit.
+
+    Raises:
+        ValueError: If no arrangement of the blocks solves the puzzle.
+    """
+    puzzle = _read_puzzle(fptr)
+    meshGrid, checkpoints = puzzle[0], puzzle[4]
+
+    # Stop at the first solution
+    found = next(_solutions(*puzzle), None)
+    if found is None:
+        raise ValueError(f"No solution for {fptr}")
+    solution_grid, solution_lasers = found
 
     # Check solution and save
     visualize_puzzle(solution_grid, solution_lasers, checkpoints, meshGrid)
@@ -0,0 +1,161 @@
+import heapq
+import time
+from collections import namedtuple
+
+from lazor_board import Board, BLOCK_NAMES, CODES, OPEN
+from lazor_candidates import switch_placement
+from lazor_simulator import LazorSim
+from lazor_stats import phase
+
+# Outcome of BestFirstSearch.solve(). Without a solution, placements and
+# paths are those of the partial board that hit the most targets, and
+# exhausted says whether every board worth trying was tried.
+AnytimeResult = namedtuple("AnytimeResult",
+                           "solved placements paths hit_targets hit_ratio exhausted nodes")
+
+
+class BestFirstSearch:
+    """
+    Search that always grows the most promising partial board next and can
+    be stopped at any point with the best board found so far.
+
+    Like BacktrackSearch, blocks only go into open cells the beams cross and
+    unused blocks are parked in the cells no beam crosses. Each partial
+    board is simulated when it is generated and scored by the targets its
+    beams hit; boards where some target is out of reach of the blocks left
+    (see lazor_reach) cannot be completed and are not grown, but still
+    count towards the best board. Ties go to the board with fewer blocks
+    left. A board reached by placing the same blocks in another order is
+    only scored once.
+    """
+
+    def __init__(self, parsed, stats=None):
+        with phase(stats, "setup"):
+            self.board = Board.from_grid(parsed["grid"])
+            self.blocks = dict(parsed["blocks"])
+            self.stats = stats
+            self.sim = LazorSim(self.board, parsed["lazors"], parsed["targets"], stats=stats)
+            self.current = ()  # the (x, y, key) placements on self.board
+
+    def solve(self, time_limit=None, max_nodes=None, should_stop=None):
+        """
+        Search until a solution is found, every board is tried, `time_limit`
+        seconds have passed or `max_nodes` boards were simulated, and return
+        an AnytimeResult.
+        """
+        deadline = None if time_limit is None else time.monotonic() + time_limit
+        heap = []   # (-hits, blocks left, order, placements, cells to grow into)
+        seen = {()}
+        nodes = 0
+        best = None  # ((hits, -blocks placed), placements)
+        solution = None
+
+        def out_of_budget():
+            if max_nodes is not None and nodes >= max_nodes:
+                return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return True
+            return should_stop is not None and nodes % 64 == 0 and should_stop()
+
+        with phase(self.stats, "search"):
+            pending = [()]
+            stopped = False
+            while solution is None and not stopped:
+                for placements in pending:
+                    nodes += 1
+                    solved, hits, cells = self._score(placements)
+                    if best is None or (hits, -len(placements)) > best[0]:
+                        best = (hits, -len(placements)), placements
+                    if solved:
+                        parked = self._parked(placements)
+                        if parked is not None:
+                            solution = placements + parked
+                            break
+                    if cells:
+                        left = sum(self._left(placements).values())
+                        heapq.heappush(heap, (-hits, left, nodes, placements, cells))
+                    if out_of_budget():
+                        stopped = True
+                        break
+                else:
+                    if not heap:
+                        break
+                    pending = self._children(heapq.heappop(heap), seen)
+        exhausted = solution is None and not stopped
+
+        with phase(self.stats, "paths"):
+            placements = solution if solution is not None else best[1]
+            self._show(placements)
+            self.sim.simulate()
+            hits = len(self.sim.hit_targets)
+            total = len(self.sim.target_list)
+            return AnytimeResult(
+                solution is not None,
+                [(x, y, BLOCK_NAMES[CODES[key]]) for x, y, key in placements],
+                self.sim.get_paths(),
+                sorted(self.sim.hit_targets),
+                hits / total if total else 1.0,
+                exhausted,
+                nodes,
+            )
+
+    def _score(self, placements):
+        # Trace a board once: (solved, targets hit, open cells to grow into)
+        self._show(placements)
+        if self.stats is not None:
+            self.stats.candidates += 1
+        left = self._left(placements)
+        spare = any(left.values())
+        result = self.sim.run(stop_early=False, inventory=left if spare else None)
+        hits = len(self.sim.hit_targets)
+        if not spare:
+            return result.solved, hits, ()
+        if result.unreachable_mask:
+            if self.stats is not None:
+                self.stats.pruned_reach += 1
+            return result.solved, hits, ()
+        cells = tuple((x, y) for x, y in sorted(self.sim.crossed) if self.board.get(x, y) == OPEN)
+        return result.solved, hits, cells
+
+    def _children(self, entry, seen):
+        # The boards one more block away from a heap entry's, not seen before
+        placements, cells = entry[3], entry[4]
+        left = self._left(placements)
+        children = []
+        for x, y in cells:
+            for key in "ABC":
+                if left[key]:
+                    child = tuple(sorted(placements + ((x, y, key),)))
+                    if child not in seen:
+                        seen.add(child)
+                        children.append(child)
+        if self.stats is not None:
+            self.stats.generated += len(children)
+        return children
+
+    def _left(self, placements):
+        left = dict(self.blocks)
+        for _, _, key in placements:
+            left[key] -= 1
+        return left
+
+    def _parked(self, placements):
+        # The leftover blocks put into open cells no beam crosses, or None
+        free = [cell for cell in self.board.open_cells() if cell not in self.sim.crossed]
+        left = self._left(placements)
+        leftover = [k for k in "ABC" for _ in range(left[k])]
+        if len(free) < len(leftover):
+            return None
+        return tuple((x, y, key) for (x, y), key in zip(free, leftover))
+
+    def _show(self, placements):
+        # Make self.board hold exactly `placements`
+        if placements != self.current:
+            switch_placement(self.sim, {(x, y): key for x, y, key in self.current},
+                             {(x, y): key for x, y, key in placements})
+            self.current = placements
+
+
+def best_first(parsed, time_limit=None, max_nodes=None, should_stop=None, stats=None):
+    """Run a BestFirstSearch within the budget; returns an AnytimeResult."""
+    return BestFirstSearch(parsed, stats).solve(time_limit, max_nodes, should_stop)
@@ -0,0 +1,96 @@
+import numpy as np
+
+from lazor_board import CODES, DIRECTIONS, LETTERS, OPEN
+from lazor_reach import start_states
+from lazor_table import TransitionTable
+
+MAX_TARGETS = 62  # targets a board's int64 hit mask has room for
+
+
+class BatchTable:
+    """A TransitionTable flattened into NumPy arrays for simulate_batch."""
+
+    def __init__(self, table):
+        self.table = table
+        self.probe = np.array(table.probe, dtype=np.int64)
+        # succ[s, code] holds up to two next states, padded with -1
+        self.succ = np.full((table.size, len(LETTERS), 2), -1, dtype=np.int64)
+        for s, moves in enumerate(table.moves):
+            for code, next_states in enumerate(moves):
+                self.succ[s, code, :len(next_states)] = next_states
+
+    def target_bits(self, targets):
+        bits = np.zeros(self.table.size, dtype=np.int64)
+        for i, (x, y) in enumerate(targets):
+            for d in DIRECTIONS:
+                s = self.table.state(x, y, d)
+                if s is not None:
+                    bits[s] |= 1 << i
+        return bits
+
+
+def simulate_batch(grids, lazors, targets, table=None, stop_early=True):
+    """
+    Simulate N candidate boards at once and return a bool array of which
+    ones hit every target.
+
+    `grids` is an int array of cell codes (see lazor_board) shaped
+    [N, height, width]. All beams of all boards advance together, one
+    lattice step per iteration, using table lookups on whole arrays; each
+    board keeps its own visited set, so looping beams die out. Hits are the
+    same as LazorSim.run()'s. With stop_early a board's beams are dropped
+    once it is solved.
+    """
+    grids = np.asarray(grids)
+    n, height, width = grids.shape
+    if table is None:
+        table = BatchTable(TransitionTable(width, height))
+    elif isinstance(table, TransitionTable):
+        table = BatchTable(table)
+    size = table.table.size
+    cells = grids.reshape(n, height * width)
+    targets = sorted(set(targets))
+    if len(targets) > MAX_TARGETS:
+        raise ValueError(f"simulate_batch tracks at most {MAX_TARGETS} targets")
+    bits = table.target_bits(targets)
+    full = (1 << len(targets)) - 1
+
+    hit = np.zeros(n, dtype=np.int64)
+    visited = np.zeros((n, size), dtype=bool)
+
+    starts = np.unique(np.array(start_states(table.table, lazors), dtype=np.int64))
+    board = np.repeat(np.arange(n), len(starts))
+    state = np.tile(starts, n)
+
+    while board.size:
+        visited[board, state] = True
+        np.bitwise_or.at(hit, board, bits[state])
+        if stop_early:
+            live = hit[board] != full
+            board, state = board[live], state[live]
+
+        c = table.probe[state]
+        code = np.where(c >= 0, cells[board, np.maximum(c, 0)], OPEN)
+        nxt = table.succ[state, code]                       # [beams, 2]
+        board = np.repeat(board, 2)
+        state = nxt.reshape(-1)
+        keep = state >= 0
+        board, state = board[keep], state[keep]
+        keep = ~visited[board, state]
+        board, state = board[keep], state[keep]
+        if board.size:
+            # Two beams can reach the same state in the same step
+            key = np.unique(board * size + state)
+            board, state = key // size, key % size
+    return hit == full
+
+
+def placement_grids(board, placements):
+    """Stack copies of `board` with each placement's blocks put in: [N, H, W]."""
+    base = np.frombuffer(bytes(board.cells), dtype=np.uint8).astype(np.int64)
+    grids = np.repeat(base[None, :], len(placements), axis=0)
+    if placements and placements[0]:
+        index = np.array([[y * board.width + x for (x, y), _ in p] for p in placements])
+        codes = np.array([[CODES[key] for _, key in p] for p in placements])
+        grids[np.arange(len(placements))[:, None], index] = codes
+    return grids.reshape(len(placements), board.height, board.width)
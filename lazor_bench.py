@@ -0,0 +1,231 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from itertools import islice
+
+from bff_parser import parse_bff
+from lazor_bitboard import BitBoard
+from lazor_board import Board, BLOCKS, NAME_CODES
+from lazor_candidates import count_placements, iter_placements
+from lazor_generate import bff_text, make_board
+from lazor_jump import JumpIndex
+from lazor_simulator import LazorSim
+from lazor_solver import solve_board
+from lazor_stats import SearchStats
+from lazor_symmetry import CandidateReducer
+
+# Benchmarks over a fixed, seeded corpus of boards of increasing size and
+# block count, so results from different commits can be compared:
+#     python lazor_bench.py                      # writes bench_results.json
+#     python lazor_bench.py --quick              # first boards only
+#     python lazor_bench.py --compare old.json   # also print the change vs old.json
+
+# name, width, height, blocks, lazors, targets
+CORPUS = [
+    ("3x3", 3, 3, {"A": 1, "B": 1, "C": 0}, 1, 2),
+    ("4x4", 4, 4, {"A": 2, "B": 1, "C": 1}, 1, 3),
+    ("5x5", 5, 5, {"A": 3, "B": 1, "C": 1}, 2, 3),
+    ("6x6", 6, 6, {"A": 4, "B": 2, "C": 1}, 2, 5),
+    ("8x8", 8, 8, {"A": 6, "B": 2, "C": 2}, 3, 8),
+    ("10x10", 10, 10, {"A": 8, "B": 3, "C": 2}, 4, 10),
+    ("14x14", 14, 14, {"A": 12, "B": 4, "C": 3}, 6, 14),
+    ("20x20", 20, 20, {"A": 18, "B": 6, "C": 4}, 8, 20),
+]
+QUICK = 4  # --quick keeps the first boards only
+
+BACKENDS = ("backtrack", "target", "sat", "anytime", "enumerate", "batch", "bitboard")
+# The enumerating backends only run on boards with at most this many
+# candidates left after lazor_symmetry's reduction
+ENUMERATE_LIMIT = 20000
+V2_CANDIDATES = 200  # placements fed to the Version 2 solve_maze per board
+
+
+def _best(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _peak_kib(fn):
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def _record(results, benchmark, board, fn, repeat, candidates=None, calls=1):
+    seconds = _best(fn, repeat) / calls
+    entry = {"benchmark": benchmark, "board": board, "seconds": seconds,
+             "peak_kib": _peak_kib(fn)}
+    if candidates is not None:
+        entry["candidates"] = candidates
+        entry["candidates_per_second"] = candidates / seconds if seconds else None
+    results.append(entry)
+    print(f"{benchmark:24s} {board:6s} {seconds * 1000:10.3f} ms", flush=True)
+
+
+def _v2_modules():
+    # Version 2 needs numpy and matplotlib; returns the ImportError if missing
+    version2 = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            "Version2_with_visualization")
+    sys.path.append(version2)
+    try:
+        from file_reader import readbff
+        from solver import solve_maze
+        from lazor_table import TransitionTable, EDGE
+    except ImportError as e:
+        return e
+    finally:
+        sys.path.remove(version2)
+    return readbff, solve_maze, TransitionTable, EDGE
+
+
+def run(quick=False, repeat=None):
+    """Run every benchmark over the corpus; returns the list of result dicts."""
+    repeat = repeat or (2 if quick else 3)
+    corpus = CORPUS[:QUICK] if quick else CORPUS
+    results = []
+    skipped = []
+    try:
+        import numpy  # for the batch backend
+        have_numpy = True
+    except ImportError:
+        have_numpy = False
+        skipped.append("solve_board[batch]: needs numpy")
+    v2 = _v2_modules()
+    if isinstance(v2, ImportError):
+        skipped.append(f"v2 solve_maze: {v2}")
+        v2 = None
+    try:
+        from visualize import draw_board
+    except ImportError as e:
+        draw_board = None
+        skipped.append(f"visualize.draw_board: {e}")
+
+    with tempfile.TemporaryDirectory() as folder:
+        for seed, (name, width, height, blocks, n_lazors, n_targets) in enumerate(corpus):
+            parsed = make_board(seed, width, height, blocks, n_lazors, n_targets)
+            path = os.path.join(folder, f"{name}.bff")
+            with open(path, "w") as f:
+                f.write(bff_text(parsed))
+
+            _record(results, "parse_bff", name, lambda: parse_bff(path), repeat)
+
+            space = CandidateReducer(parsed)
+            space = count_placements(len(space.relevant), blocks, len(space.irrelevant))
+            for backend in BACKENDS:
+                if backend in ("enumerate", "batch", "bitboard") and space > ENUMERATE_LIMIT:
+                    continue
+                if backend == "batch" and not have_numpy:
+                    continue
+                stats = SearchStats()
+                solution = solve_board(parsed, backend=backend, stats=stats)
+                _record(results, f"solve_board[{backend}]", name,
+                        lambda: solve_board(parsed, backend=backend), repeat,
+                        candidates=stats.candidates)
+            placements, paths = solution
+
+            board = Board.from_grid(parsed["grid"])
+            for x, y, block in placements:
+                board.place(x, y, NAME_CODES[block])
+            sim = LazorSim(board, parsed["lazors"], parsed["targets"])
+            _record(results, "LazorSim.simulate", name,
+                    lambda: [sim.simulate() for _ in range(100)], repeat, calls=100)
+            jumps = JumpIndex(Board.from_grid(parsed["grid"]), sim.table, sim.target_list)
+            jump_sim = LazorSim(board, parsed["lazors"], parsed["targets"], jumps=jumps)
+            _record(results, "LazorSim.simulate[jumps]", name,
+                    lambda: [jump_sim.simulate() for _ in range(100)], repeat, calls=100)
+            bits = BitBoard(board, parsed["lazors"], parsed["targets"])
+            _record(results, "BitBoard.simulate", name,
+                    lambda: [bits.simulate() for _ in range(100)], repeat, calls=100)
+
+            if v2 is not None:
+                readbff, solve_maze, TransitionTable, EDGE = v2
+                v2_path = os.path.join(folder, f"{name}_v2.bff")
+                with open(v2_path, "w") as f:
+                    f.write(bff_text(parsed, v2=True))
+                mesh, counts, lasers, goals = readbff(v2_path)
+                goals = [g[::-1] for g in goals]
+                starts = [p[::-1] for p in lasers["laser_pos"]]
+                dirs = [d[::-1] for d in lasers["laser_dir"]]
+                table = TransitionTable(width, height, physics=EDGE)
+                cells = [(i, j) for i, row in enumerate(mesh) for j, c in enumerate(row) if c == "o"]
+                grids = []
+                for placement in islice(iter_placements(cells, parsed["blocks"]), V2_CANDIDATES):
+                    grid = mesh.copy()
+                    for location, block in placement:
+                        grid[location] = block
+                    grids.append(grid)
+                _record(results, "v2 solve_maze", name,
+                        lambda: [solve_maze(g, starts, dirs, goals, counts[2], table) for g in grids],
+                        repeat, candidates=len(grids))
+
+            if draw_board is not None:
+                image = os.path.join(folder, f"{name}.png")
+                drawn = [[BLOCKS.get(board.get(x, y), letter) for x, letter in enumerate(row)]
+                         for y, row in enumerate(parsed["grid"])]
+                _record(results, "visualize.draw_board", name,
+                        lambda: draw_board(drawn, placements, paths, filename=image), repeat)
+    for reason in skipped:
+        print(f"skipped {reason}")
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_results(results, path):
+    report = {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "machine": platform.platform(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+def compare(old_path, new_path):
+    """Print each benchmark's time in two result files and the new/old ratio."""
+    with open(old_path, encoding="utf-8") as f:
+        old = {(r["benchmark"], r["board"]): r for r in json.load(f)["results"]}
+    with open(new_path, encoding="utf-8") as f:
+        new = json.load(f)["results"]
+    for r in new:
+        before = old.get((r["benchmark"], r["board"]))
+        if before is None:
+            continue
+        ratio = r["seconds"] / before["seconds"] if before["seconds"] else float("inf")
+        print(f"{r['benchmark']:24s} {r['board']:6s} {before['seconds'] * 1000:10.3f} ms"
+              f" -> {r['seconds'] * 1000:10.3f} ms  x{ratio:.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the Lazor parser, tracer, solvers and rendering.")
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--quick", action="store_true")
+    parser.add_argument("--repeat", type=int)
+    parser.add_argument("--compare", metavar="OLD_JSON")
+    args = parser.parse_args()
+    write_results(run(args.quick, args.repeat), args.out)
+    if args.compare:
+        compare(args.compare, args.out)
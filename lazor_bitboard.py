@@ -0,0 +1,134 @@
+from lazor_board import Board, DIRECTIONS, OPAQUE, REFLECT, REFRACT, TURNS
+
+BLOCKING = (REFLECT, OPAQUE, REFRACT)  # the codes that turn or stop a beam
+
+
+class BitBoard:
+    """
+    Beam simulation on bitboards: each set of lattice points is one Python
+    int, bit (y + 1) * span + x + 1 standing for point (x, y).
+
+    The lattice has a margin of one point all round (as in lazor_table), so
+    a beam stepping off the board lands in the margin instead of wrapping
+    onto the next row, and the margin is masked off before the next step.
+    A layer per block type holds the centres of the cells with that block.
+    simulate() keeps one int of beam points per direction and moves them
+    all at once: the points on a blocking layer are turned with shifts,
+    the rest shift straight on, and points already seen in that direction
+    are dropped, until nothing new is reached. The targets are then one
+    AND against the points seen. Hits and crossed cells are the same as
+    LazorSim's.
+    """
+
+    def __init__(self, grid, lazors, targets, stats=None):
+        # A lazor_stats.SearchStats as `stats` counts simulations and beam steps
+        board = grid if isinstance(grid, Board) else Board.from_grid(grid)
+        self.width, self.height = w, h = board.width, board.height
+        self.span = span = 2 * w + 3
+        self.target_list = sorted(set(targets))
+        self.target_bits = [self.bit(x, y) for x, y in self.target_list]
+        self.targets = sum(self.target_bits)
+        row = ((1 << (2 * w + 1)) - 1) << 1
+        self.lattice = sum(row << (y + 1) * span for y in range(2 * h + 1))
+        self.centres = [self.bit(2 * x + 1, 2 * y + 1) for y in range(h) for x in range(w)]
+        self.all_centres = sum(self.centres)
+        # Shift of one step in each direction, and the direction indexes a
+        # block sends a beam arriving in direction d off in
+        self.steps = [dy * span + dx for dx, dy in DIRECTIONS]
+        # Fill rounds to cover the longest diagonal (see _fill)
+        self.doublings = (2 * max(w, h) + 1).bit_length()
+        self.turns = {code: [[DIRECTIONS.index(nd) for nd in TURNS[code][d]] for d in DIRECTIONS]
+                      for code in BLOCKING}
+        self.layers = {code: 0 for code in BLOCKING}
+        for i, code in enumerate(board.cells):
+            if code in self.layers:
+                self.layers[code] |= self.centres[i]
+        self.starts = [0] * len(DIRECTIONS)
+        for lazor in lazors:
+            (x, y), d = lazor["position"], lazor["direction"]
+            self.starts[DIRECTIONS.index(d)] |= self.bit(x + d[0], y + d[1])
+        self.seen = list(self.starts)
+        self.rounds = 0
+        self.stats = stats
+
+    def bit(self, x, y):
+        return 1 << (y + 1) * self.span + x + 1
+
+    def set_cell(self, x, y, code):
+        """Put the cell `code` (see lazor_board) into cell (x, y)."""
+        bit = self.centres[y * self.width + x]
+        for c in BLOCKING:
+            self.layers[c] &= ~bit
+        if code in self.layers:
+            self.layers[code] |= bit
+
+    def simulate(self):
+        """Propagate every beam to a fixpoint; True if all targets are hit."""
+        steps, doublings = self.steps, self.doublings
+        layers = [(self.layers[code], self.turns[code]) for code in BLOCKING]
+        blocked = self.layers[REFLECT] | self.layers[OPAQUE] | self.layers[REFRACT]
+        free = self.lattice & ~blocked
+        frontier = list(self.starts)
+        seen = list(frontier)
+        rounds = 0
+        while any(frontier):
+            rounds += 1
+            moved = [0] * len(DIRECTIONS)
+            for d, points in enumerate(frontier):
+                if not points:
+                    continue
+                # Slide along the diagonal to the first block or the margin
+                ray = _fill(points & free, free, steps[d], doublings)
+                ends = _shift(ray, steps[d]) & ~free
+                seen[d] |= ray | ends
+                stopped = (points | ends) & blocked
+                if stopped:
+                    for layer, turns in layers:
+                        turned = stopped & layer
+                        if turned:
+                            for nd in turns[d]:
+                                moved[nd] |= _shift(turned, steps[nd])
+            for d, points in enumerate(moved):
+                frontier[d] = points & ~seen[d]
+                seen[d] |= frontier[d]
+        self.seen = seen
+        self.rounds = rounds
+        if self.stats is not None:
+            self.stats.simulations += 1
+            self.stats.beam_steps += self.beam_steps()
+        return self.hit() == self.targets
+
+    def hit(self):
+        """Bits of the target points reached by the last simulate()."""
+        return (self.seen[0] | self.seen[1] | self.seen[2] | self.seen[3]) & self.targets
+
+    def hit_targets(self):
+        hit = self.hit()
+        return {t for t, bit in zip(self.target_list, self.target_bits) if hit & bit}
+
+    def crossed(self):
+        """(x, y) cells whose centre a beam passed through."""
+        points = (self.seen[0] | self.seen[1] | self.seen[2] | self.seen[3]) & self.all_centres
+        w = self.width
+        return {(i % w, i // w) for i, bit in enumerate(self.centres) if points & bit}
+
+    def beam_steps(self):
+        """Beam states reached by the last simulate(), as LazorSim counts them."""
+        return sum(points.bit_count() for points in self.seen)
+
+
+def _fill(points, free, step, doublings):
+    """
+    Every point reached from `points` by repeated steps through `free`
+    points, found with shifts of step, 2 step, 4 step ... (a Kogge-Stone
+    fill): after k doublings, runs of up to 2 ** k - 1 points are covered.
+    """
+    for _ in range(doublings):
+        points |= free & _shift(points, step)
+        free &= _shift(free, step)
+        step *= 2
+    return points
+
+
+def _shift(points, step):
+    return points << step if step > 0 else points >> -step
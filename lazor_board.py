@@ -0,0 +1,72 @@
+from lazor_blocks import Block, ReflectBlock, OpaqueBlock, RefractBlock
+
+# Cell codes, in the order of LETTERS
+OPEN, FIXED, REFLECT, OPAQUE, REFRACT = range(5)
+LETTERS = "oxABC"
+CODES = {letter: code for code, letter in enumerate(LETTERS)}
+
+BLOCKS = {REFLECT: ReflectBlock(), OPAQUE: OpaqueBlock(), REFRACT: RefractBlock()}
+BLOCK_NAMES = {code: type(block).__name__ for code, block in BLOCKS.items()}
+NAME_CODES = {name: code for code, name in BLOCK_NAMES.items()}
+
+DIRECTIONS = [(1, 1), (1, -1), (-1, 1), (-1, -1)]
+
+# TURNS[code] maps an incoming direction to the outgoing ones, or is None
+# for cells a beam passes straight through.
+TURNS = [None] * len(LETTERS)
+for _code, _block in BLOCKS.items():
+    TURNS[_code] = {d: tuple(_block.interact(None, d)) for d in DIRECTIONS}
+
+
+def code_of(cell):
+    """Cell code for a grid letter, a Block instance or a code."""
+    if isinstance(cell, int):
+        return cell
+    if isinstance(cell, Block):
+        return NAME_CODES[type(cell).__name__]
+    return CODES[cell]
+
+
+class Board:
+    """
+    Cell contents of a board as a flat bytearray of codes, row by row.
+
+    Placing and removing blocks changes one byte in place, so a search can
+    reuse one Board for every candidate instead of copying grids.
+    """
+
+    __slots__ = ("width", "height", "cells")
+
+    def __init__(self, width, height, cells=None):
+        self.width = width
+        self.height = height
+        self.cells = bytearray(cells) if cells is not None else bytearray(width * height)
+
+    @classmethod
+    def from_grid(cls, grid):
+        """Build from a list-of-lists grid of letters and/or Block instances."""
+        board = cls(len(grid[0]), len(grid))
+        board.cells[:] = bytes(code_of(cell) for row in grid for cell in row)
+        return board
+
+    def to_grid(self):
+        w = self.width
+        return [[LETTERS[c] for c in self.cells[y * w:(y + 1) * w]]
+                for y in range(self.height)]
+
+    def copy(self):
+        return Board(self.width, self.height, self.cells)
+
+    def get(self, x, y):
+        return self.cells[y * self.width + x]
+
+    def place(self, x, y, code):
+        self.cells[y * self.width + x] = code
+
+    def unplace(self, x, y):
+        self.cells[y * self.width + x] = OPEN
+
+    def open_cells(self):
+        """(x, y) of every open cell, row by row."""
+        w = self.width
+        return [(i % w, i // w) for i, c in enumerate(self.cells) if c == OPEN]
@@ -0,0 +1,98 @@
+import hashlib
+import json
+import sqlite3
+import time
+import zlib
+
+from lazor_board import Board, BLOCK_NAMES, CODES, NAME_CODES, OPEN
+from lazor_simulator import LazorSim
+
+DEFAULT_CACHE = "lazor_cache.sqlite"
+
+
+def board_key(parsed):
+    """
+    Hash of a parsed board that ignores how the .bff was written: only the
+    grid, block counts, lazors and targets go in, in a fixed order.
+    """
+    canonical = {
+        "grid": [list(row) for row in parsed["grid"]],
+        "blocks": sorted(parsed["blocks"].items()),
+        "lazors": sorted([list(l["position"]), list(l["direction"])] for l in parsed["lazors"]),
+        "targets": sorted(list(t) for t in set(parsed["targets"])),
+    }
+    text = json.dumps(canonical, separators=(",", ":"), sort_keys=True)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def verify(parsed, placements):
+    """True if `placements` uses exactly the board's blocks and solves it."""
+    wanted = sorted(BLOCK_NAMES[CODES[k]] for k, n in parsed["blocks"].items() for _ in range(n))
+    if sorted(name for _, _, name in placements) != wanted:
+        return False
+    board = Board.from_grid(parsed["grid"])
+    for x, y, name in placements:
+        if not (0 <= x < board.width and 0 <= y < board.height) or board.get(x, y) != OPEN:
+            return False
+        board.place(x, y, NAME_CODES[name])
+    return LazorSim(board, parsed["lazors"], parsed["targets"]).simulate()
+
+
+class SolutionCache:
+    """
+    Solutions stored in a local SQLite file, keyed by board_key().
+
+    Entries hold the placements and the zlib-compressed lazor paths. Once
+    there are more than max_entries, the least recently used are dropped.
+    A cached solution is re-simulated before it is returned and discarded
+    if it no longer solves the board.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE, max_entries=10000):
+        self.max_entries = max_entries
+        self.db = sqlite3.connect(path, timeout=30)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS solutions ("
+            " key TEXT PRIMARY KEY, placements TEXT NOT NULL,"
+            " paths BLOB NOT NULL, last_used REAL NOT NULL)")
+        self.db.commit()
+
+    def get(self, parsed):
+        """Return a verified (placements, paths) for this board, or None."""
+        key = board_key(parsed)
+        row = self.db.execute("SELECT placements, paths FROM solutions WHERE key = ?",
+                              (key,)).fetchone()
+        if row is None:
+            return None
+        placements = [tuple(p) for p in json.loads(row[0])]
+        if not verify(parsed, placements):
+            self.db.execute("DELETE FROM solutions WHERE key = ?", (key,))
+            self.db.commit()
+            return None
+        paths = [[tuple(point) for point in path]
+                 for path in json.loads(zlib.decompress(row[1]))]
+        self.db.execute("UPDATE solutions SET last_used = ? WHERE key = ?", (time.time(), key))
+        self.db.commit()
+        return placements, paths
+
+    def put(self, parsed, placements, paths):
+        self.db.execute(
+            "INSERT OR REPLACE INTO solutions VALUES (?, ?, ?, ?)",
+            (board_key(parsed), json.dumps(placements),
+             zlib.compress(json.dumps(paths).encode()), time.time()))
+        self.db.execute(
+            "DELETE FROM solutions WHERE key IN (SELECT key FROM solutions"
+            " ORDER BY last_used DESC LIMIT -1 OFFSET ?)", (self.max_entries,))
+        self.db.commit()
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM solutions").fetchone()[0]
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
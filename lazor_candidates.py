@@ -0,0 +1,118 @@
+from itertools import combinations, product
+from math import comb
+
+from lazor_board import CODES, OPEN
+
+
+def iter_placements(cells, blocks, first=None, parking=()):
+    """
+    Lazily yield every distinct way to put the blocks into `cells`.
+
+    `blocks` maps a block key to how many of it must be placed, e.g.
+    {'A': 2, 'B': 0, 'C': 1}. Blocks of one key are interchangeable, so each
+    placement is yielded exactly once, as a tuple of (cell, key) pairs.
+
+    `parking` lists extra cells where it makes no difference which block
+    sits where (see lazor_reach.split_open_cells). Blocks may be left out of
+    `cells` and parked there instead, always filling the parking cells in
+    order with keys sorted, so each multiset of parked keys counts once.
+
+    With `first`, only placements whose first pair in `cells` is cells[first]
+    are yielded (shard 0 also gets those that park every block); these are
+    contiguous in the full order, so the shards first=0, 1, ... partition
+    the stream in order.
+    """
+    cells = list(cells)
+    if not parking:
+        yield from _shard(cells, blocks, first)
+        return
+    splits = _park_splits(blocks, len(parking))
+    if first in (None, 0):
+        for placed, parked in splits:
+            if not any(placed.values()):
+                yield tuple(zip(parking, parked))
+    for f in (range(len(cells)) if first is None else [first]):
+        for placed, parked in splits:
+            if any(placed.values()):
+                tail = tuple(zip(parking, parked))
+                for placement in _shard(cells, placed, f):
+                    yield placement + tail
+
+
+def switch_placement(sim, current, wanted):
+    """
+    Change the cells of `sim` (anything with set_cell(x, y, code)) from the
+    placement `current` to `wanted`, both {(x, y): key} dicts, touching only
+    the cells that differ. Returns `wanted`, the new current placement.
+    """
+    for (x, y) in current:
+        if (x, y) not in wanted:
+            sim.set_cell(x, y, OPEN)
+    for (x, y), key in wanted.items():
+        if current.get((x, y)) != key:
+            sim.set_cell(x, y, CODES[key])
+    return wanted
+
+
+def _park_splits(blocks, capacity):
+    # Every way to park some blocks: (blocks still to place, parked keys),
+    # fewest parked first
+    keys = list(blocks)
+    splits = []
+    for counts in product(*(range(blocks[k] + 1) for k in keys)):
+        if sum(counts) <= capacity:
+            placed = {k: blocks[k] - n for k, n in zip(keys, counts)}
+            parked = "".join(k * n for k, n in sorted(zip(keys, counts)))
+            splits.append((placed, parked))
+    splits.sort(key=lambda split: len(split[1]))
+    return splits
+
+
+def _shard(cells, blocks, first):
+    keys = [(key, n) for key, n in blocks.items() if n > 0]
+    if sum(n for _, n in keys) > len(cells):
+        return
+    if first is None:
+        yield from _place(cells, keys, ())
+        return
+    if not keys:
+        return
+    (key, n), rest = keys[0], keys[1:]
+    head = cells[first]
+    for picked in combinations(range(first + 1, len(cells)), n - 1):
+        taken = set(picked)
+        remaining = [c for i, c in enumerate(cells) if i != first and i not in taken]
+        yield from _place(remaining, rest,
+                          ((head, key),) + tuple((cells[i], key) for i in picked))
+
+
+def _place(cells, keys, chosen):
+    if not keys:
+        yield chosen
+        return
+    (key, n), rest = keys[0], keys[1:]
+    for picked in combinations(range(len(cells)), n):
+        taken = set(picked)
+        remaining = [c for i, c in enumerate(cells) if i not in taken]
+        yield from _place(remaining, rest,
+                          chosen + tuple((cells[i], key) for i in picked))
+
+
+def count_placements(n_cells, blocks, parking=0):
+    """Number of placements iter_placements would yield, without generating them."""
+    if parking:
+        return sum(count_placements(n_cells, placed)
+                   for placed, _ in _park_splits(blocks, parking))
+    total = 1
+    for n in blocks.values():
+        total *= comb(n_cells, n)
+        n_cells -= n
+        if n_cells < 0:
+            return 0
+    return total
+
+
+def search_space(parsed):
+    """Size of the brute-force candidate space for a parsed board."""
+    open_cells = sum(row.count("o") for row in parsed["grid"])
+    return count_placements(open_cells, parsed["blocks"])
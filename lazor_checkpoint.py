@@ -0,0 +1,73 @@
+import json
+import os
+import time
+
+from lazor_cache import board_key
+from lazor_stats import SearchStats
+
+# Backends that can save their position and pick it up again
+RESUMABLE = ("backtrack", "target", "enumerate", "plain")
+
+
+class Checkpoint:
+    """
+    Where a long search has got to, saved to a small JSON file so it can be
+    picked up again after the process is restarted.
+
+    The position is what the backend needs to get back to the same place:
+    for the backtracking searches the index of the choice taken at each
+    depth down to the board being searched, for enumerate the number of
+    arrangements already tried. Saving writes a few hundred bytes to a
+    temporary file and renames it over the old one, so an interrupted save
+    leaves the previous checkpoint intact. The file is tied to one board
+    (by lazor_cache.board_key) and backend; it is loaded, with the search
+    statistics saved alongside, when the Checkpoint is made.
+    """
+
+    def __init__(self, path, parsed, backend, interval=5.0):
+        if backend not in RESUMABLE:
+            raise ValueError(f"Backend {backend} cannot be checkpointed")
+        self.path = path
+        self.key = board_key(parsed)
+        self.backend = backend
+        self.interval = interval
+        self.position = None
+        self.stats = None
+        self.saves = 0
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                saved = json.load(f)
+            if saved["board"] != self.key or saved["backend"] != backend:
+                raise ValueError(f"{path} is a checkpoint of another board or backend")
+            self.position = saved["position"]
+            self.stats = saved["stats"]
+        self._last = time.monotonic()
+
+    def due(self):
+        """True once `interval` seconds have passed since the last save."""
+        return time.monotonic() - self._last >= self.interval
+
+    def save(self, position, stats=None):
+        state = {
+            "board": self.key,
+            "backend": self.backend,
+            "position": position,
+            "stats": stats.as_dict() if stats is not None else None,
+            "saved": time.time(),
+        }
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.path)
+        self._last = time.monotonic()
+        self.saves += 1
+
+    def restore_stats(self, stats):
+        """Add the saved counters to `stats`, so they cover the whole search."""
+        if stats is not None and self.stats:
+            stats.merge(SearchStats.from_dict(self.stats))
+
+    def finish(self):
+        """Remove the file once the search has run to the end."""
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,127 @@
+import argparse
+import os
+import random
+
+from lazor_board import Board, BLOCK_NAMES, CODES
+from lazor_simulator import LazorSim
+
+# Random boards that are solvable by construction, for stress testing:
+#     python lazor_generate.py OUT_FOLDER --size 10x10 --blocks A=8,B=3,C=2 --lazors 4 --targets 10
+#     python lazor_generate.py OUT_FOLDER --scale       # one board per SCALES entry
+
+# name, width, height, blocks, lazors, targets: a series of growing boards
+SCALES = [
+    ("small", 5, 5, {"A": 3, "B": 1, "C": 1}, 2, 3),
+    ("medium", 10, 10, {"A": 8, "B": 3, "C": 2}, 4, 10),
+    ("large", 20, 20, {"A": 18, "B": 6, "C": 4}, 8, 20),
+    ("huge", 40, 40, {"A": 40, "B": 12, "C": 8}, 16, 40),
+    ("extreme", 80, 80, {"A": 90, "B": 25, "C": 15}, 32, 80),
+]
+
+
+def make_board(seed, width, height, blocks, n_lazors, n_targets, mix="ooooox",
+               attempts=1000, solution=False):
+    """
+    A solvable parsed board: blocks are put in at random first, and the
+    targets are picked from the corner points the beams then hit that they
+    would miss on the empty board.
+
+    Grid letters are drawn uniformly from `mix`, so repeating a letter
+    weights it ("ooooox" is about one fixed cell in six; A, B or C give
+    fixed blocks). With solution=True returns (parsed, placements), the
+    placements being the blocks put in, as the solvers return them. Raises
+    ValueError if no board with `n_targets` such points turns up in
+    `attempts` tries.
+    """
+    rng = random.Random(seed)
+    keys = [k for k, n in blocks.items() for _ in range(n)]
+    for _ in range(attempts):
+        grid = [[rng.choice(mix) for _ in range(width)] for _ in range(height)]
+        board = Board.from_grid(grid)
+        cells = board.open_cells()
+        if len(cells) < len(keys):
+            continue
+        rng.shuffle(cells)
+        placements = [(x, y, BLOCK_NAMES[CODES[key]]) for (x, y), key in zip(cells, keys)]
+        for (x, y), key in zip(cells, keys):
+            board.place(x, y, CODES[key])
+        lazors = [{"position": (2 * rng.randrange(width + 1), 2 * rng.randrange(height + 1)),
+                   "direction": (rng.choice((-1, 1)), rng.choice((-1, 1)))}
+                  for _ in range(n_lazors)]
+        corners = [(x, y) for x in range(0, 2 * width + 1, 2) for y in range(0, 2 * height + 1, 2)]
+        sim = LazorSim(board, lazors, corners)
+        sim.simulate()
+        # Only points the beams reach because of the blocks
+        empty = LazorSim(grid, lazors, corners)
+        empty.simulate()
+        hit = sorted(sim.hit_targets - empty.hit_targets)
+        if len(hit) >= n_targets:
+            parsed = {"grid": grid, "blocks": dict(blocks), "lazors": lazors,
+                      "targets": rng.sample(hit, n_targets)}
+            return (parsed, sorted(placements)) if solution else parsed
+    raise ValueError(f"No {width}x{height} board with {n_targets} targets in {attempts} attempts")
+
+
+def bff_text(parsed, v2=False):
+    """.bff text for a parsed board; v2=True writes points as "P x y" for Version 2's reader."""
+    lines = ["GRID START"] + [" ".join(row) for row in parsed["grid"]] + ["GRID STOP"]
+    lines += [f"{k} {n}" for k, n in parsed["blocks"].items() if n]
+    lines += ["L {} {} {} {}".format(*l["position"], *l["direction"]) for l in parsed["lazors"]]
+    if v2:
+        lines += [f"P {x} {y}" for x, y in parsed["targets"]]
+    else:
+        lines += [f"P ({x // 2}, {y // 2})" for x, y in parsed["targets"]]
+    return "\n".join(lines) + "\n"
+
+
+def write_boards(folder, specs, seed=0, v2=False, mix="ooooox"):
+    """
+    Write one .bff file per (name, width, height, blocks, lazors, targets)
+    spec into `folder`, seeding board i with seed + i. Returns the paths.
+    """
+    os.makedirs(folder, exist_ok=True)
+    paths = []
+    for i, (name, width, height, blocks, n_lazors, n_targets) in enumerate(specs):
+        parsed = make_board(seed + i, width, height, blocks, n_lazors, n_targets, mix)
+        path = os.path.join(folder, f"{name}.bff")
+        with open(path, "w") as f:
+            f.write(bff_text(parsed, v2))
+        paths.append(path)
+    return paths
+
+
+def _size(text):
+    width, height = text.lower().split("x")
+    return int(width), int(height)
+
+
+def _blocks(text):
+    blocks = {"A": 0, "B": 0, "C": 0}
+    for part in text.split(","):
+        key, n = part.split("=")
+        blocks[key.strip().upper()] = int(n)
+    return blocks
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write random solvable .bff boards.")
+    parser.add_argument("folder")
+    parser.add_argument("--scale", action="store_true", help="one board per SCALES entry")
+    parser.add_argument("--count", type=int, default=1)
+    parser.add_argument("--size", type=_size, default=(6, 6), metavar="WxH")
+    parser.add_argument("--blocks", type=_blocks, default={"A": 4, "B": 2, "C": 1},
+                        metavar="A=n,B=n,C=n")
+    parser.add_argument("--lazors", type=int, default=2)
+    parser.add_argument("--targets", type=int, default=4)
+    parser.add_argument("--mix", default="ooooox", help="letters the grid is drawn from")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--v2", action="store_true", help='write points as "P x y" for Version 2')
+    args = parser.parse_args()
+    if args.scale:
+        specs = SCALES
+    else:
+        width, height = args.size
+        specs = [(f"random_{width}x{height}_{args.seed + i}", width, height, args.blocks,
+                  args.lazors, args.targets) for i in range(args.count)]
+    for path in write_boards(args.folder, specs, args.seed, args.v2, args.mix):
+        print(path)
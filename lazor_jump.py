@@ -0,0 +1,120 @@
+from lazor_board import DIRECTIONS, OPEN
+
+
+class JumpIndex:
+    """
+    Where a beam goes between open cells, worked out once per board.
+
+    Only what sits in the board's open cells changes from one candidate to
+    the next; empty lattice points, fixed cells and blocks given in the
+    grid always send a beam the same way. For a beam state (see
+    lazor_table), segment() follows it through all of those at once and
+    returns:
+
+      mask       bits of the targets passed on the way (bit i for
+                 targets[i], as LazorSim.target_list)
+      decisions  the states that reach an open cell, where the candidate's
+                 contents decide what comes next
+      crossed    the indexes of the other cells whose centre is passed
+
+    A segment is a set of states rather than a line, since fixed refract
+    blocks split beams. Segments are built the first time they are asked
+    for and kept, so a tracer (see jump_trace) pays for each stretch of
+    static beam once and afterwards only for the open cells it crosses.
+    """
+
+    def __init__(self, board, table, targets):
+        self.table = table
+        self.cells = bytes(board.cells)  # the layout segments are valid for
+        self.targets = list(targets)
+        bits = {}
+        for i, (x, y) in enumerate(self.targets):
+            for d in DIRECTIONS:
+                s = table.state(x, y, d)
+                if s is not None:
+                    bits[s] = bits.get(s, 0) | 1 << i
+        self.bits = bits
+        self._segments = {}
+        self._after = [None] * (table.size * 8)  # [d * 8 + code]: after(d, code)
+
+    def segment(self, s):
+        """(mask, decisions, crossed) for a beam entering state s."""
+        found = self._segments.get(s)
+        if found is None:
+            found = self._segments[s] = self._follow(s)
+        return found
+
+    def after(self, d, code):
+        """
+        The segments a beam in decision state d goes on to when its open
+        cell holds `code`, merged into one (mask, decisions, crossed).
+        """
+        key = d * 8 + code
+        found = self._after[key]
+        if found is None:
+            mask, decisions, crossed = 0, (), ()
+            for t in self.table.moves[d][code]:
+                m, ds, cs = self.segment(t)
+                mask, decisions, crossed = mask | m, decisions + ds, crossed + cs
+            found = self._after[key] = (mask, decisions, (self.table.probe[d],) + crossed)
+        return found
+
+    def _follow(self, start):
+        probe, moves = self.table.probe, self.table.moves
+        cells, bits = self.cells, self.bits
+        mask = 0
+        decisions = []
+        crossed = []
+        seen = {start}
+        stack = [start]
+        while stack:
+            s = stack.pop()
+            mask |= bits.get(s, 0)
+            c = probe[s]
+            if c >= 0:
+                code = cells[c]
+                if code == OPEN:
+                    decisions.append(s)
+                    continue
+                crossed.append(c)
+            else:
+                code = OPEN
+            for t in moves[s][code]:
+                if t not in seen:
+                    seen.add(t)
+                    stack.append(t)
+        return mask, tuple(decisions), tuple(crossed)
+
+
+def jump_trace(index, cells, starts):
+    """
+    Trace beams from the `starts` states over `cells`, a board with the
+    index's layout plus blocks in some of its open cells, jumping from one
+    open cell to the next. Returns (hit_mask, crossed cell indexes,
+    open-cell states processed). The targets hit and cells crossed are
+    those lazor_trace.trace_beams' walk gives.
+    """
+    probe = index.table.probe
+    segment, after, known = index.segment, index.after, index._after
+    hit = 0
+    crossed = set()
+    seen = bytearray(index.table.size)
+    stack = []
+    for s in starts:
+        mask, decisions, passed = segment(s)
+        hit |= mask
+        crossed.update(passed)
+        stack.extend(decisions)
+    steps = 0
+    while stack:
+        d = stack.pop()
+        if seen[d]:
+            continue
+        seen[d] = 1
+        steps += 1
+        code = cells[probe[d]]
+        mask, decisions, passed = known[d * 8 + code] or after(d, code)
+        hit |= mask
+        crossed.update(passed)
+        stack.extend(decisions)
+    return hit, crossed, steps
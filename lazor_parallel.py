@@ -0,0 +1,86 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from lazor_stats import SearchStats
+
+NOT_FOUND = 2 ** 31 - 1
+
+# Per-worker state, set once by _init_worker
+_parsed = None
+_found = None
+
+
+def _init_worker(parsed, found):
+    global _parsed, _found
+    _parsed = parsed
+    _found = found
+
+
+def _solve_shard(backend, index, shard, deterministic):
+    from lazor_solver import BACKENDS
+
+    if deterministic:
+        # Only an earlier shard's solution makes this one pointless
+        def should_stop():
+            return _found.value < index
+    else:
+        def should_stop():
+            return _found.value != NOT_FOUND
+
+    stats = SearchStats()
+    if should_stop():
+        return index, None, stats
+    placements, paths = BACKENDS[backend](_parsed, first=shard, should_stop=should_stop,
+                                          stats=stats)
+    if placements is None:
+        return index, None, stats
+    with _found.get_lock():
+        if index < _found.value:
+            _found.value = index
+    return index, (placements, paths), stats
+
+
+def solve_parallel(parsed, backend="backtrack", workers=None, deterministic=False, stats=None):
+    """
+    Solve a board across `workers` processes; returns (placements, paths)
+    or (None, []) like lazor_solver.solve_board.
+
+    The backend's search is split into shards by first placement (see
+    lazor_solver.SHARDS). The parsed board is sent to each worker once, at
+    start-up. As soon as a shard finds a solution the rest are cancelled;
+    with deterministic=True only later shards are, so the lowest-index
+    solution wins and the answer matches a single-process run.
+
+    `stats` (a SearchStats) gets the totals of every shard that reported back.
+    """
+    from lazor_solver import BACKENDS, SHARDS
+
+    shards = SHARDS[backend](parsed)
+    if shards is None or len(shards) < 2:
+        return BACKENDS[backend](parsed, stats=stats)
+
+    found = multiprocessing.Value("i", NOT_FOUND)
+    best = None
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(parsed, found)) as pool:
+        pending = {pool.submit(_solve_shard, backend, i, shard, deterministic): i
+                   for i, shard in enumerate(shards)}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                del pending[future]
+                index, solution, shard_stats = future.result()
+                if stats is not None:
+                    stats.merge(shard_stats)
+                if solution is not None and (best is None or index < best[0]):
+                    best = (index, solution)
+            if best is None:
+                continue
+            for future, index in list(pending.items()):
+                if (not deterministic or index > best[0]) and future.cancel():
+                    del pending[future]
+            if not deterministic:
+                break
+    # Leaving the with-block waits for running shards, which stop at their
+    # next should_stop() check.
+    return best[1] if best is not None else (None, [])
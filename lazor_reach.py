@@ -0,0 +1,83 @@
+from lazor_board import Board, CODES, OPEN
+from lazor_table import TransitionTable
+
+
+def start_states(table, lazors):
+    """The first table state of each lazor, one step on from its position."""
+    starts = []
+    for lazor in lazors:
+        (x, y), (dx, dy) = lazor["position"], lazor["direction"]
+        s = table.state(x + dx, y + dy, (dx, dy))
+        if s is not None:
+            starts.append(s)
+    return starts
+
+
+def reachable_states(board, starts, inventory, table):
+    """
+    Over-approximate every table state a beam leaving `starts` could reach
+    if the blocks left in `inventory` ({'A': n, 'B': n, 'C': n}) were placed
+    anywhere in the open cells of `board`.
+
+    Blocks already on the board act as usual; an open cell may either let
+    the beam through or send it any way a remaining block type would.
+    """
+    probe, moves = table.probe, table.moves
+    cells = board.cells
+    spare = [OPEN] + [CODES[k] for k, n in inventory.items() if n > 0]
+
+    seen = set()
+    stack = list(starts)
+    while stack:
+        s = stack.pop()
+        if s in seen:
+            continue
+        seen.add(s)
+        c = probe[s]
+        if c < 0:
+            stack.extend(moves[s][OPEN])
+        elif cells[c] == OPEN:
+            for code in spare:
+                stack.extend(moves[s][code])
+        else:
+            stack.extend(moves[s][cells[c]])
+    return seen
+
+
+def reachable_points(board, lazors, inventory, table=None):
+    """
+    The lattice points reachable_states() allows, for the beams of `lazors`
+    on `board` (a Board or a list-of-lists grid).
+    """
+    if not isinstance(board, Board):
+        board = Board.from_grid(board)
+    table = table or TransitionTable.for_board(board)
+    seen = reachable_states(board, start_states(table, lazors), inventory, table)
+    return {table.points[s] for s in seen}
+
+
+def split_open_cells(board, lazors, inventory, table=None, starts=None):
+    """
+    Split the open cells of `board` into (relevant, parking), both in
+    board order. A block changes a beam only in a cell the beam probes, so
+    blocks put into parking cells, which no beam can probe under any
+    arrangement, make no difference to the result. `starts` overrides the
+    start states worked out from `lazors`.
+    """
+    if not isinstance(board, Board):
+        board = Board.from_grid(board)
+    table = table or TransitionTable.for_board(board)
+    if starts is None:
+        starts = start_states(table, lazors)
+    seen = reachable_states(board, starts, inventory, table)
+    probed = {table.cell_xy[table.probe[s]] for s in seen if table.probe[s] >= 0}
+    relevant, parking = [], []
+    for cell in board.open_cells():
+        (relevant if cell in probed else parking).append(cell)
+    return relevant, parking
+
+
+def targets_reachable(board, lazors, targets, inventory, table=None):
+    """True if every target could still be hit by some completion of `board`."""
+    points = reachable_points(board, lazors, inventory, table)
+    return all(t in points for t in targets)
@@ -0,0 +1,447 @@
+import heapq
+
+from lazor_board import Board, BLOCK_NAMES, CODES, OPEN
+from lazor_jump import JumpIndex
+from lazor_reach import reachable_states, split_open_cells, start_states
+from lazor_simulator import LazorSim
+from lazor_stats import phase
+from lazor_table import TransitionTable
+from lazor_trace import trace_beams
+
+
+class SatSolver:
+    """
+    A small CDCL SAT solver: two watched literals per clause, first-UIP
+    clause learning, decisions by variable activity with saved phases, and
+    Luby restarts.
+
+    Variables are 1..n and literals non-zero ints, negative for "not", as
+    in DIMACS. Clauses can be added between calls to solve().
+    """
+
+    def __init__(self):
+        self.n_vars = 0
+        self.clauses = []
+        self.watches = [[], []]   # watches[_index(lit)]: clauses watching lit
+        self.units = []
+        self.empty = False
+        self.value = [0]          # value[v]: 1 true, -1 false, 0 unassigned
+        self.level = [0]
+        self.reason = [-1]
+        self.activity = [0.0]
+        self.phase = [False]
+        self.increment = 1.0
+        self.conflicts = 0
+
+    def new_var(self):
+        self.n_vars += 1
+        self.value.append(0)
+        self.level.append(0)
+        self.reason.append(-1)
+        self.activity.append(0.0)
+        self.phase.append(False)
+        self.watches += [[], []]
+        return self.n_vars
+
+    def add_clause(self, lits):
+        lits = list(dict.fromkeys(lits))
+        if any(-lit in lits for lit in lits):
+            return  # always true
+        if not lits:
+            self.empty = True
+        elif len(lits) == 1:
+            self.units.append(lits[0])
+        else:
+            self._attach(lits)
+
+    def solve(self, should_stop=None):
+        """
+        A model as a list of booleans indexed by variable (index 0 unused),
+        False if there is none, or None if should_stop() said to give up.
+        """
+        if self.empty:
+            return False
+        self._reset()
+        for lit in self.units:
+            if self._lit_value(lit) < 0:
+                return False
+            if self._lit_value(lit) == 0:
+                self._assign(lit, -1)
+        if self._propagate() >= 0:
+            return False
+        heap = [(-self.activity[v], v) for v in range(1, self.n_vars + 1)]
+        heapq.heapify(heap)
+        self.heap = heap
+        restart, luby_i = 0, 1
+        limit = 100 * _luby(luby_i)
+        while True:
+            conflict = self._propagate()
+            if conflict >= 0:
+                self.conflicts += 1
+                restart += 1
+                if len(self.trail_lim) == 0:
+                    return False
+                learnt, back = self._analyze(conflict)
+                self._backtrack(back)
+                if len(learnt) == 1:
+                    self.units.append(learnt[0])
+                    self._assign(learnt[0], -1)
+                else:
+                    self._assign(learnt[0], self._attach(learnt))
+                self.increment /= 0.95
+                if should_stop is not None and self.conflicts % 256 == 0 and should_stop():
+                    return None
+                continue
+            if restart >= limit:
+                restart, luby_i = 0, luby_i + 1
+                limit = 100 * _luby(luby_i)
+                self._backtrack(0)
+                continue
+            v = self._pick()
+            if v == 0:
+                return [False] + [self.value[i] > 0 for i in range(1, self.n_vars + 1)]
+            self.trail_lim.append(len(self.trail))
+            self._assign(v if self.phase[v] else -v, -1)
+
+    def _reset(self):
+        for v in range(1, self.n_vars + 1):
+            self.value[v] = 0
+            self.reason[v] = -1
+        self.trail = []
+        self.trail_lim = []
+        self.qhead = 0
+
+    def _attach(self, lits):
+        self.clauses.append(lits)
+        i = len(self.clauses) - 1
+        self.watches[_index(lits[0])].append(i)
+        self.watches[_index(lits[1])].append(i)
+        return i
+
+    def _lit_value(self, lit):
+        v = self.value[abs(lit)]
+        return v if lit > 0 else -v
+
+    def _assign(self, lit, reason):
+        v = abs(lit)
+        self.value[v] = 1 if lit > 0 else -1
+        self.level[v] = len(self.trail_lim)
+        self.reason[v] = reason
+        self.trail.append(lit)
+
+    def _propagate(self):
+        # Returns the index of a conflicting clause, or -1
+        clauses, watches, value = self.clauses, self.watches, self.value
+        trail = self.trail
+        while self.qhead < len(trail):
+            false_lit = -trail[self.qhead]
+            self.qhead += 1
+            ws = watches[_index(false_lit)]
+            kept = []
+            for k, ci in enumerate(ws):
+                c = clauses[ci]
+                if c[0] == false_lit:
+                    c[0], c[1] = c[1], c[0]
+                first = c[0]
+                fv = value[abs(first)] if first > 0 else -value[abs(first)]
+                if fv > 0:
+                    kept.append(ci)
+                    continue
+                for m in range(2, len(c)):
+                    lit = c[m]
+                    if (value[abs(lit)] if lit > 0 else -value[abs(lit)]) >= 0:
+                        c[1], c[m] = lit, false_lit
+                        watches[_index(lit)].append(ci)
+                        break
+                else:
+                    kept.append(ci)
+                    if fv < 0:
+                        kept += ws[k + 1:]
+                        watches[_index(false_lit)] = kept
+                        return ci
+                    self._assign(first, ci)
+            watches[_index(false_lit)] = kept
+        return -1
+
+    def _analyze(self, conflict):
+        # First-UIP learnt clause (asserting literal first) and the level to go back to
+        level, reason, trail = self.level, self.reason, self.trail
+        current = len(self.trail_lim)
+        seen = set()
+        learnt = [0]
+        count = 0
+        lits = self.clauses[conflict]
+        i = len(trail) - 1
+        while True:
+            for q in lits:
+                v = abs(q)
+                if v not in seen and level[v] > 0:
+                    seen.add(v)
+                    self._bump(v)
+                    if level[v] == current:
+                        count += 1
+                    else:
+                        learnt.append(q)
+            while abs(trail[i]) not in seen:
+                i -= 1
+            p = trail[i]
+            i -= 1
+            count -= 1
+            if count == 0:
+                break
+            lits = self.clauses[reason[abs(p)]][1:]
+        learnt[0] = -p
+        back = 0
+        if len(learnt) > 1:
+            best = max(range(1, len(learnt)), key=lambda j: level[abs(learnt[j])])
+            learnt[1], learnt[best] = learnt[best], learnt[1]
+            back = level[abs(learnt[1])]
+        return learnt, back
+
+    def _bump(self, v):
+        self.activity[v] += self.increment
+        if self.activity[v] > 1e100:
+            self.activity = [a * 1e-100 for a in self.activity]
+            self.increment *= 1e-100
+            self.heap = [(-self.activity[u], u) for u in range(1, self.n_vars + 1)]
+            heapq.heapify(self.heap)
+        else:
+            heapq.heappush(self.heap, (-self.activity[v], v))
+
+    def _backtrack(self, level):
+        if len(self.trail_lim) <= level:
+            return
+        start = self.trail_lim[level]
+        for lit in self.trail[start:]:
+            v = abs(lit)
+            self.phase[v] = lit > 0
+            self.value[v] = 0
+            self.reason[v] = -1
+            heapq.heappush(self.heap, (-self.activity[v], v))
+        del self.trail[start:]
+        del self.trail_lim[level:]
+        self.qhead = start
+
+    def _pick(self):
+        heap, value, activity = self.heap, self.value, self.activity
+        while heap:
+            a, v = heapq.heappop(heap)
+            if value[v] == 0 and -a == activity[v]:
+                return v
+        return 0
+
+
+def _index(lit):
+    return 2 * lit if lit > 0 else -2 * lit + 1
+
+
+def _luby(i):
+    # i-th term (from 1) of the Luby sequence 1 1 2 1 1 2 4 ...
+    k = 1
+    while (1 << k) - 1 < i:
+        k += 1
+    while (1 << k) - 1 != i:
+        i -= (1 << (k - 1)) - 1
+        k = 1
+        while (1 << k) - 1 < i:
+            k += 1
+    return 1 << (k - 1)
+
+
+def at_most(solver, lits, k):
+    """Add clauses allowing at most k of `lits` true (sequential counter)."""
+    n = len(lits)
+    if k >= n:
+        return
+    if k == 0:
+        for lit in lits:
+            solver.add_clause([-lit])
+        return
+    s = [[solver.new_var() for _ in range(k)] for _ in range(n - 1)]
+    solver.add_clause([-lits[0], s[0][0]])
+    for j in range(1, k):
+        solver.add_clause([-s[0][j]])
+    for i in range(1, n - 1):
+        solver.add_clause([-lits[i], s[i][0]])
+        solver.add_clause([-s[i - 1][0], s[i][0]])
+        for j in range(1, k):
+            solver.add_clause([-lits[i], -s[i - 1][j - 1], s[i][j]])
+            solver.add_clause([-s[i - 1][j], s[i][j]])
+        solver.add_clause([-lits[i], -s[i - 1][k - 1]])
+    solver.add_clause([-lits[n - 1], -s[n - 2][k - 1]])
+
+
+class LazorModel:
+    """
+    A board as a SAT problem.
+
+    Each open cell a beam could probe gets one variable per content (open,
+    or each block type left in the inventory), exactly one of them true;
+    each beam state (lattice point and direction, see lazor_table) that a
+    beam could reach gets a variable saying a beam is there. A beam in a
+    state moves on to every next state the cell's content allows, and a
+    beam is only in a state (other than a lazor's first) if one moved
+    there. Counters keep the blocks within the inventory, parking the rest
+    in cells no beam can reach, and every target needs a beam in one of
+    its states.
+
+    A beam looping on its own, fed by nothing, satisfies these clauses
+    too, so solve() re-simulates each model; when it does not really
+    solve the board, the loops it relied on are ruled out and the solver
+    runs again.
+    """
+
+    def __init__(self, parsed, board=None, table=None):
+        self.parsed = parsed
+        self.board = board or Board.from_grid(parsed["grid"])
+        self.table = table or TransitionTable.for_board(self.board)
+        self.inventory = dict(parsed["blocks"])
+        self.solver = SatSolver()
+        self.cell_vars = {}     # cell index -> {code: var}
+        self.feasible = self._encode()
+        # Models only differ in open cells: one jump index checks them all
+        self.jumps = JumpIndex(self.board, self.table, sorted(set(parsed["targets"])))
+
+    def _encode(self):
+        board, table, solver = self.board, self.table, self.solver
+        probe, moves, points = table.probe, table.moves, table.points
+        inventory = self.inventory
+        lazors = self.parsed["lazors"]
+        starts = start_states(table, lazors)
+        reach = reachable_states(board, starts, inventory, table)
+        relevant, self.parking = split_open_cells(board, lazors, inventory, table, starts)
+        total = sum(inventory.values())
+        if total > len(relevant) + len(self.parking):
+            return False
+
+        codes = [OPEN] + [CODES[k] for k, n in inventory.items() if n > 0]
+        for x, y in relevant:
+            cell_vars = {code: solver.new_var() for code in codes}
+            self.cell_vars[y * board.width + x] = cell_vars
+            lits = list(cell_vars.values())
+            solver.add_clause(lits)
+            at_most(solver, lits, 1)
+        self.beam = beam = {s: solver.new_var() for s in reach}
+
+        # Forward: a beam moves on to whatever the cell lets through
+        # preds[t]: (s, literal true if a beam moves from s to t)
+        self.preds = preds = {s: [] for s in reach}
+        for s in reach:
+            c = probe[s]
+            if c < 0 or board.cells[c] != OPEN:
+                for t in moves[s][board.cells[c] if c >= 0 else OPEN]:
+                    solver.add_clause([-beam[s], beam[t]])
+                    preds[t].append((s, beam[s]))
+                continue
+            options = self.cell_vars[c]
+            for t in {t for code in codes for t in moves[s][code]}:
+                allowed = [v for code, v in options.items() if t in moves[s][code]]
+                others = [v for code, v in options.items() if t not in moves[s][code]]
+                solver.add_clause([-beam[s], beam[t]] + others)
+                if not others:
+                    preds[t].append((s, beam[s]))
+                    continue
+                # moved: a beam in s and a content that sends it to t
+                moved = solver.new_var()
+                solver.add_clause([-moved, beam[s]])
+                solver.add_clause([-moved] + allowed)
+                preds[t].append((s, moved))
+
+        # Backward: a beam is only where one came from, or at a lazor
+        self.starts = start_set = set(starts)
+        for s in reach:
+            if s not in start_set:
+                solver.add_clause([-beam[s]] + [lit for _, lit in preds[s]])
+        for s in start_set:
+            solver.add_clause([beam[s]])
+
+        for target in self.parsed["targets"]:
+            solver.add_clause([beam[s] for s in reach if points[s] == target])
+
+        for key, n in inventory.items():
+            if n > 0:
+                at_most(solver, [v[CODES[key]] for v in self.cell_vars.values()], n)
+        # Blocks that do not fit the parking cells must go into relevant ones
+        at_most(solver, [v[OPEN] for v in self.cell_vars.values()],
+                max(len(relevant) - max(total - len(self.parking), 0), 0))
+        return True
+
+    def solutions(self, should_stop=None, stats=None):
+        """
+        Yield (placed, parked) for every way to solve the board, lazily:
+        the (x, y, key) blocks in cells beams can reach, and the counts
+        ({'A': n, ...}) of the blocks left over for the parking cells
+        (self.parking), where it does not matter which goes where. Each
+        is checked by LazorSim first.
+        """
+        if not self.feasible:
+            return
+        width = self.board.width
+        while True:
+            model = self.solver.solve(should_stop)
+            if not model:
+                return
+            chosen = [v for options in self.cell_vars.values() for v in options.values() if model[v]]
+            placed = [(c % width, c // width, _KEYS[code])
+                      for c, options in self.cell_vars.items()
+                      for code, v in options.items() if model[v] and code != OPEN]
+            parked = dict(self.inventory)
+            for _, _, key in placed:
+                parked[key] -= 1
+            if stats is not None:
+                stats.candidates += 1
+            board = self.board.copy()
+            for x, y, key in placed + self.park(parked):
+                board.place(x, y, CODES[key])
+            sim = LazorSim(board, self.parsed["lazors"], self.parsed["targets"],
+                           table=self.table, stats=stats, jumps=self.jumps)
+            if sim.simulate():
+                yield placed, parked
+                # Any other solution puts something else in some cell
+                self.solver.add_clause([-v for v in chosen])
+            else:
+                self._forbid_loops(model, board)
+
+    def park(self, parked):
+        """(x, y, key) placements filling the parking cells in order with the `parked` counts."""
+        keys = [k for k in "ABC" for _ in range(parked.get(k, 0))]
+        return [(x, y, key) for (x, y), key in zip(self.parking, keys)]
+
+    def solve(self, should_stop=None, stats=None):
+        """
+        (x, y, key) placements that solve the board, checked by LazorSim,
+        or None if there are none (or should_stop() said to give up).
+        """
+        for placed, parked in self.solutions(should_stop, stats):
+            return sorted(placed + self.park(parked))
+        return None
+
+    def _forbid_loops(self, model, board):
+        # The model has beams in states no lazor feeds: loops that only
+        # support themselves. Require any beam in those states to come
+        # from outside them (a loop formula, as answer set solvers use).
+        trace = trace_beams(self.table, board.cells, [(None, s) for s in self.starts])
+        real = set(trace.visited)
+        loop = {s for s, v in self.beam.items() if model[v] and s not in real}
+        outside = [lit for t in loop for s, lit in self.preds[t] if s not in loop]
+        for s in loop:
+            self.solver.add_clause([-self.beam[s]] + outside)
+
+
+_KEYS = {code: key for key, code in CODES.items()}
+
+
+def sat_solve(parsed, should_stop=None, stats=None):
+    """Solve a parsed board with LazorModel; returns (placements, paths) or None."""
+    with phase(stats, "setup"):
+        model = LazorModel(parsed)
+    with phase(stats, "search"):
+        placements = model.solve(should_stop, stats)
+    if placements is None:
+        return None
+    with phase(stats, "paths"):
+        board = model.board
+        for x, y, key in placements:
+            board.place(x, y, CODES[key])
+        sim = LazorSim(board, parsed["lazors"], parsed["targets"], table=model.table)
+        return [(x, y, BLOCK_NAMES[CODES[key]]) for x, y, key in placements], sim.get_paths()
@@ -0,0 +1,205 @@
+from lazor_board import Board, BLOCK_NAMES, CODES, LETTERS, OPEN
+from lazor_simulator import LazorSim
+from lazor_stats import phase
+from lazor_symmetry import board_symmetries
+from lazor_table import TransitionTable
+from lazor_transposition import TranspositionTable, Zobrist
+
+# Entries kept in a search's transposition table by default
+TT_ENTRIES = 1 << 16
+
+
+class SearchStopped(Exception):
+    """Raised inside a search when its should_stop callback says so."""
+
+
+class BacktrackSearch:
+    """
+    Depth-first search that places one block at a time, only ever in an open
+    cell the current beams cross.
+
+    A block in a cell no beam crosses cannot change the beams, so every
+    solution can be built by first placing its "active" blocks in the order
+    the beams reach them and then parking the rest in uncrossed cells.
+    Branches are cut as soon as some target is out of reach of any
+    completion (see lazor_reach), and a choice is skipped when a board
+    symmetry that fixes the blocks placed so far maps it onto one already
+    tried (see lazor_symmetry): its subtree is a mirror image of that one.
+
+    The same blocks are often reached by placing them in different orders.
+    Boards whose subtree was searched without success are remembered by
+    Zobrist hash in a bounded TranspositionTable (`transpositions`; pass
+    False to turn it off) and skipped when reached again.
+
+    With a lazor_checkpoint.Checkpoint the choice indexes down to the board
+    being searched are saved every so often, and a saved path is followed
+    back down before the search carries on from there.
+    """
+
+    def __init__(self, parsed, should_stop=None, stats=None, transpositions=None,
+                 checkpoint=None):
+        with phase(stats, "setup"):
+            self.board = Board.from_grid(parsed["grid"])
+            self.inventory = dict(parsed["blocks"])
+            self.placements = []
+            self.should_stop = should_stop
+            self.stats = stats
+            self.symmetries = board_symmetries(parsed, self.board)
+            self.sim = LazorSim(self.board, parsed["lazors"], parsed["targets"],
+                                incremental=True, table=TransitionTable.for_board(self.board),
+                                stats=stats)
+            if transpositions is None:
+                transpositions = TranspositionTable(TT_ENTRIES)
+            self.transpositions = transpositions if transpositions is not False else None
+            self.zobrist = Zobrist(self.board.width * self.board.height, len(LETTERS))
+            self.hash = 0
+            self.checkpoint = checkpoint
+            self.path = []  # index of the choice taken at each depth
+            self._resume = list(checkpoint.position or ()) if checkpoint is not None else []
+
+    def root_choices(self):
+        """
+        The (x, y, key) placements the search branches on first, in order,
+        or None if the empty board is already solved once blocks are parked.
+        """
+        if self.sim.simulate() and self._can_park():
+            return None
+        return self._distinct(list(self._choices()), self.symmetries)
+
+    def solve(self, first=None):
+        """
+        Return (placements, paths) for the first solution found, or None.
+
+        `first` restricts the search to the subtree below one of
+        root_choices(), which is how the parallel solver shards the work.
+        """
+        try:
+            with phase(self.stats, "search"):
+                if first is None:
+                    found = self._search()
+                else:
+                    found = self._try(*first)
+        except SearchStopped:
+            return None
+        if not found:
+            return None
+        with phase(self.stats, "paths"):
+            return (
+                [(x, y, BLOCK_NAMES[CODES[key]]) for x, y, key in self.placements],
+                self.sim.get_paths()
+            )
+
+    def _free_cells(self):
+        return [cell for cell in self.board.open_cells() if cell not in self.sim.crossed]
+
+    def _can_park(self):
+        return len(self._free_cells()) >= sum(self.inventory.values())
+
+    def _park(self):
+        # Fill remaining blocks into open cells no beam touches.
+        free = self._free_cells()
+        leftover = [k for k in "ABC" for _ in range(self.inventory[k])]
+        if len(free) < len(leftover):
+            return False
+        for (x, y), key in zip(free, leftover):
+            self.sim.set_cell(x, y, CODES[key])
+            self.placements.append((x, y, key))
+        return True
+
+    def _choices(self):
+        # Block placements into open cells the current beams cross
+        for x, y in sorted(self.sim.crossed):
+            if self.board.get(x, y) != OPEN:
+                continue
+            for key in "ABC":
+                if self.inventory[key]:
+                    yield x, y, key
+
+    def _stabiliser(self):
+        # Symmetries that map the current placements onto themselves
+        placed = {((x, y), key) for x, y, key in self.placements}
+        return [sym for sym in self.symmetries
+                if {(sym.cell(cell), key) for cell, key in placed} == placed]
+
+    def _distinct(self, choices, symmetries):
+        # Drop choices that one of `symmetries` maps onto an earlier choice
+        if not symmetries:
+            return choices
+        kept, seen = [], set()
+        for x, y, key in choices:
+            if any((sym.cell((x, y)), key) in seen for sym in symmetries):
+                if self.stats is not None:
+                    self.stats.pruned_symmetry += 1
+                continue
+            kept.append((x, y, key))
+            seen.add(((x, y), key))
+        return kept
+
+    def _search(self):
+        if self.should_stop is not None and self.should_stop():
+            raise SearchStopped
+        if self.checkpoint is not None and self.checkpoint.due():
+            self.checkpoint.save(self.path, self.stats)
+        if self.stats is not None:
+            self.stats.candidates += 1
+        # One trace gives the hits, the crossed cells and, if the board is
+        # not solved yet, the targets out of reach of the blocks left
+        result = self.sim.run(stop_early=False,
+                              inventory=self.inventory if any(self.inventory.values()) else None)
+        if self._expand(result):
+            return True
+        if self.transpositions is not None:
+            self.transpositions.put(self.hash, sum(self.inventory.values()))
+        return False
+
+    def _expand(self, result):
+        # Finish the search of the current board, already traced by run()
+        if not any(self.inventory.values()):
+            return result.solved
+        if result.solved and self._park():
+            return True
+        if result.unreachable_mask:
+            if self.stats is not None:
+                self.stats.pruned_reach += 1
+            return False
+
+        choices = list(self._choices())
+        if self.stats is not None:
+            self.stats.generated += len(choices)
+        if self.symmetries:
+            choices = self._distinct(choices, self._stabiliser())
+        start = self._resume.pop(0) if self._resume else 0
+        for i in range(start, len(choices)):
+            self.path.append(i)
+            found = self._try(*choices[i])
+            self.path.pop()
+            if found:
+                return True
+            self._resume.clear()  # only the first subtree was part way through
+        return False
+
+    def _try(self, x, y, key):
+        code = CODES[key]
+        h = self.hash ^ self.zobrist.key(y * self.board.width + x, code)
+        tt = self.transpositions
+        if tt is not None and tt.get(h) is not None:
+            # Searched before, reached through another order
+            if self.stats is not None:
+                self.stats.pruned_transposition += 1
+            return False
+        self.hash = h
+        self.sim.set_cell(x, y, code)
+        self.inventory[key] -= 1
+        self.placements.append((x, y, key))
+        if self._search():
+            return True
+        self.placements.pop()
+        self.inventory[key] += 1
+        self.sim.set_cell(x, y, OPEN)
+        self.hash ^= self.zobrist.key(y * self.board.width + x, code)
+        return False
+
+
+def backtrack(parsed, first=None, should_stop=None, stats=None, checkpoint=None):
+    """Run a BacktrackSearch; returns (placements, paths) or None."""
+    return BacktrackSearch(parsed, should_stop, stats, checkpoint=checkpoint).solve(first)
@@ -1,63 +1,320 @@
-from lazor_blocks import Block
+from collections import namedtuple
+
+from lazor_board import Board, DIRECTIONS, OPEN, REFRACT
+from lazor_jump import JumpIndex, jump_trace
+from lazor_reach import reachable_points
+from lazor_table import TransitionTable
+from lazor_trace import trace_beams
+
+# Outcome of LazorSim.run(). Masks have bit i set for target_list[i].
+SimResult = namedtuple("SimResult", "solved hit_mask unreachable_mask steps beams")
 
 class LazorSim:
-    def __init__(self, grid, lazors, targets):
-        self.grid = grid
-        self.height = len(grid)
-        self.width = len(grid[0])
+    def __init__(self, grid, lazors, targets, incremental=False, table=None,
+                 max_steps=None, max_beams=None, stats=None, jumps=None):
+        # grid may be a Board or a list-of-lists of letters/Block instances.
+        # max_steps / max_beams cap the non-incremental trace (see
+        # lazor_trace.trace_beams); `truncated` says if a cap was reached.
+        # A lazor_stats.SearchStats as `stats` counts simulations, beam steps
+        # and splits.
+        # jumps=True (or a lazor_jump.JumpIndex for this board's layout and
+        # targets) makes the non-incremental simulate() jump between open
+        # cells instead of walking every lattice point.
+        self.board = grid if isinstance(grid, Board) else Board.from_grid(grid)
+        self.height = self.board.height
+        self.width = self.board.width
+        self.table = table or TransitionTable.for_board(self.board)
         self.lazors = lazors
         self.targets = set(targets)
+        self.target_list = sorted(self.targets)
+        self.full_mask = (1 << len(self.target_list)) - 1
         self.hit_targets = set()
+        self.crossed = set()  # (x, y) cells whose centre a beam passed through
+        self.incremental = incremental
+        self.max_steps = max_steps
+        self.max_beams = max_beams
+        self.truncated = False
+        self.stats = stats
+        self._logs = [_BeamLog(self, lazor) for lazor in lazors] if incremental else None
+        if jumps is True:
+            jumps = JumpIndex(self.board, self.table, self.target_list)
+        self.jumps = jumps
+        self._starts = None
+        self._target_bits = None
 
     def simulate(self):
         self.hit_targets.clear()
-        for lazor in self.lazors:
-            self._trace(lazor["position"], lazor["direction"])
+        self.crossed.clear()
+        if self.stats is not None:
+            self.stats.simulations += 1
+        if self.incremental:
+            cell_xy = self.table.cell_xy
+            for log in self._logs:
+                log.run()
+                self.hit_targets.update(t for t, n in log.hits.items() if n)
+                self.crossed.update(cell_xy[c] for c in log.first_probe)
+            return self.targets.issubset(self.hit_targets)
+        if self.jumps is not None and self.max_steps is None and self.max_beams is None:
+            return self._jump()
+        table = self.table
+        probe, points = table.probe, table.points
+        trace = self._trace()
+        if self.stats is not None:
+            self.stats.beam_steps += len(trace.visited)
+            self.stats.splits += len(trace.beams) - len({beam.lazor for beam in trace.beams})
+        for s in trace.visited:
+            if points[s] in self.targets:
+                self.hit_targets.add(points[s])
+            if probe[s] >= 0:
+                self.crossed.add(table.cell_xy[probe[s]])
         return self.targets.issubset(self.hit_targets)
 
-    def _trace(self, pos, direction, visited=None):
-        if visited is None:
-            visited = set()
-        x, y = pos
-        dx, dy = direction
-        path = [(x, y)]
-
-        for _ in range(200):
-            x += dx
-            y += dy
-            path.append((x, y))
-
-            if (x, y, dx, dy) in visited:
-                break
-            visited.add((x, y, dx, dy))
-
-            if (x, y) in self.targets:
-                self.hit_targets.add((x, y))
-
-            if x < 0 or y < 0 or x > 2 * self.width or y > 2 * self.height:
-                break
-
-            # Check for block at center of a cell
-            if x % 2 == 1 and y % 2 == 1:
-                cx = (x - 1) // 2
-                cy = (y - 1) // 2
-                if 0 <= cx < self.width and 0 <= cy < self.height:
-                    block = self.grid[cy][cx]
-                    if isinstance(block, Block):
-                        new_dirs = block.interact((x, y), (dx, dy))
-                        if len(new_dirs) == 1:
-                            dx, dy = new_dirs[0]  # continue straight
-                        else:
-                            # multiple beams (e.g., refracted + reflected)
-                            split_paths = []
-                            for new_dir in new_dirs:
-                                split_paths += self._trace((x, y), new_dir, visited.copy())
-                            return path + split_paths
-        return path
+    def _jump(self):
+        if self._starts is None:
+            self._starts = [s for s in (self._start_state(lazor["position"], lazor["direction"])
+                                        for lazor in self.lazors) if s is not None]
+        hit, crossed, steps = jump_trace(self.jumps, self.board.cells, self._starts)
+        if self.stats is not None:
+            self.stats.beam_steps += steps
+        cell_xy = self.table.cell_xy
+        self.crossed.update(cell_xy[c] for c in crossed)
+        self.hit_targets.update(self.targets_in(hit))
+        return hit == self.full_mask
 
-    def get_paths(self):
-        all_paths = []
+    def run(self, stop_early=True, inventory=None):
+        """
+        Trace every lazor with targets tracked as a bitmask and return a
+        SimResult; hit_targets and crossed are updated as by simulate().
+
+        With stop_early the trace ends as soon as every target is hit (in
+        incremental mode the logs are always brought up to date in full).
+        If the board is not solved, unreachable_mask holds the targets no
+        beam can reach: with `inventory` ({'A': n, ...}) that is "under any
+        placement of those blocks in the open cells", otherwise just "not
+        hit".
+        """
+        if self.incremental:
+            solved = self.simulate()
+            hit = sum(1 << i for i, t in enumerate(self.target_list) if t in self.hit_targets)
+            steps = sum(len(log.queued) for log in self._logs)
+            cells = self.board.cells
+            beams = len(self.lazors) + sum(1 for log in self._logs for c in log.probed
+                                           if c >= 0 and cells[c] == REFRACT)
+        else:
+            hit, steps, beams = self._run(stop_early)
+            solved = hit == self.full_mask
+        unreachable = 0
+        if not solved:
+            unreachable = self.full_mask & ~hit if inventory is None \
+                else self.unreachable_mask(inventory)
+        return SimResult(solved, hit, unreachable, steps, beams)
+
+    def _run(self, stop_early):
+        # The bitmask trace behind run(): (hit mask, steps, beams)
+        table = self.table
+        probe, moves = table.probe, table.moves
+        cells = self.board.cells
+        bits = self._bits()
+        full = self.full_mask
+
+        seen = bytearray(table.size)
+        stack = []
+        for lazor in self.lazors:
+            s = self._start_state(lazor["position"], lazor["direction"])
+            if s is not None and not seen[s]:
+                seen[s] = 1
+                stack.append(s)
+        hit = 0
+        steps = 0
+        beams = len(self.lazors)
+        crossed = set()
+        while stack and not (stop_early and hit == full):
+            s = stack.pop()
+            steps += 1
+            hit |= bits[s]
+            c = probe[s]
+            if c >= 0:
+                crossed.add(c)
+                next_states = moves[s][cells[c]]
+            else:
+                next_states = moves[s][OPEN]
+            if len(next_states) > 1:
+                beams += len(next_states) - 1
+            for t in next_states:
+                if not seen[t]:
+                    seen[t] = 1
+                    stack.append(t)
+
+        if self.stats is not None:
+            self.stats.simulations += 1
+            self.stats.beam_steps += steps
+            self.stats.splits += beams - len(self.lazors)
+        cell_xy = table.cell_xy
+        self.crossed.clear()
+        self.crossed.update(cell_xy[c] for c in crossed)
+        self.hit_targets.clear()
+        self.hit_targets.update(self.targets_in(hit))
+        return hit, steps, beams
+
+    def unreachable_mask(self, inventory):
+        """Targets that no placement of `inventory` in the open cells could hit."""
+        points = reachable_points(self.board, self.lazors, inventory, self.table)
+        mask = 0
+        for i, t in enumerate(self.target_list):
+            if t not in points:
+                mask |= 1 << i
+        return mask
+
+    def probing_states(self):
+        """
+        Cell index -> the beam states of the current trace that look at that
+        cell, i.e. whose next move depends on what the cell holds.
+        """
+        probe = self.table.probe
+        if self.incremental:
+            visited = [s for log in self._logs for s in log.states[:len(log.probed)]]
+        else:
+            visited = self._trace().visited
+        states = {}
+        for s in visited:
+            if probe[s] >= 0:
+                states.setdefault(probe[s], []).append(s)
+        return states
+
+    def targets_in(self, mask):
+        """The target points whose bits are set in `mask`."""
+        return [t for i, t in enumerate(self.target_list) if mask >> i & 1]
+
+    def _bits(self):
+        # bits[s]: the target bit of the point of state s, or 0
+        if self._target_bits is None:
+            bits = [0] * self.table.size
+            for i, (x, y) in enumerate(self.target_list):
+                for d in DIRECTIONS:
+                    s = self.table.state(x, y, d)
+                    if s is not None:
+                        bits[s] |= 1 << i
+            self._target_bits = bits
+        return self._target_bits
+
+    def set_cell(self, x, y, code):
+        """
+        Put the cell `code` (see lazor_board) into cell (x, y).
+
+        In incremental mode only the lazors whose beams reached that cell are
+        re-traced on the next simulate(), and only from that point on.
+        """
+        self.board.place(x, y, code)
+        if self.jumps is not None and self.jumps.cells[y * self.width + x] != OPEN:
+            # Not an open cell of the layout the index was built for
+            self.jumps = JumpIndex(self.board, self.table, self.target_list)
+        if self.incremental:
+            cell = y * self.width + x
+            for log in self._logs:
+                log.invalidate(cell)
+
+    def _start_state(self, pos, direction):
+        # State after the lazor's first step; None if it starts off the lattice
+        return self.table.state(pos[0] + direction[0], pos[1] + direction[1], direction)
+
+    def _trace(self):
+        starts = []
         for lazor in self.lazors:
-            path = self._trace(lazor["position"], lazor["direction"])
-            all_paths.append(path)
+            s = self._start_state(lazor["position"], lazor["direction"])
+            if s is not None:
+                starts.append((lazor["position"], s))
+        trace = trace_beams(self.table, self.board.cells, starts,
+                            self.max_steps, self.max_beams)
+        self.truncated = trace.truncated
+        return trace
+
+    def get_paths(self):
+        """
+        One list of points per lazor: each of its beams in turn, starting
+        at the lazor or at the point it split off from.
+        """
+        points = self.table.points
+        all_paths = [[] for _ in self.lazors]
+        # Lazors that start off the lattice have no states to trace
+        index = [i for i, lazor in enumerate(self.lazors)
+                 if self._start_state(lazor["position"], lazor["direction"]) is not None]
+        for beam in self._trace().beams:
+            all_paths[index[beam.lazor]] += [beam.origin] + [points[s] for s in beam.states]
+        for path, lazor in zip(all_paths, self.lazors):
+            if not path:
+                path.append(lazor["position"])
         return all_paths
+
+
+class _BeamLog:
+    """
+    Replayable trace of one lazor, used by LazorSim's incremental mode.
+
+    Beam states (see lazor_table) are processed first-in first-out and each
+    state is queued at most once, so `states` is both the trace and the work
+    queue. Everything before the first state that looked at a cell is
+    independent of that cell's contents, which is what lets a change be
+    handled by cutting the log back to that state and carrying on from there.
+    The set of points reached is the same as lazor_trace.trace_beams'.
+    """
+
+    def __init__(self, sim, lazor):
+        self.sim = sim
+        start = sim._start_state(lazor["position"], lazor["direction"])
+        self.states = [] if start is None else [start]
+        self.index = {state: i for i, state in enumerate(self.states)}
+        self.queued = []        # queued[i]: len(states) when state i was processed
+        self.probed = []        # probed[i]: cell index looked at by state i, or -1
+        self.first_probe = {}   # cell index -> first state index that looked at it
+        self.hits = {t: 0 for t in sim.targets}
+
+    def invalidate(self, cell):
+        k = self.first_probe.get(cell)
+        if k is None:
+            return
+        cut = self.queued[k]
+        points = self.sim.table.points
+        for i in range(k, len(self.queued)):
+            point = points[self.states[i]]
+            if point in self.hits:
+                self.hits[point] -= 1
+            probe = self.probed[i]
+            if probe >= 0 and self.first_probe.get(probe) == i:
+                del self.first_probe[probe]
+        for state in self.states[cut:]:
+            del self.index[state]
+        del self.states[cut:]
+        del self.queued[k:]
+        del self.probed[k:]
+
+    def run(self):
+        table = self.sim.table
+        probe, moves, points = table.probe, table.moves, table.points
+        cells = self.sim.board.cells
+        states, index, hits = self.states, self.index, self.hits
+        i = start = len(self.queued)
+        while i < len(states):
+            s = states[i]
+            self.queued.append(len(states))
+            point = points[s]
+            if point in hits:
+                hits[point] += 1
+
+            c = probe[s]
+            self.probed.append(c)
+            if c >= 0:
+                self.first_probe.setdefault(c, i)
+                next_states = moves[s][cells[c]]
+            else:
+                next_states = moves[s][OPEN]
+
+            for t in next_states:
+                if t not in index:
+                    index[t] = len(states)
+                    states.append(t)
+            i += 1
+        stats = self.sim.stats
+        if stats is not None:
+            # Counted afterwards so the loop costs nothing extra without stats
+            stats.beam_steps += i - start
+            stats.splits += sum(1 for c in self.probed[start:] if c >= 0 and cells[c] == REFRACT)
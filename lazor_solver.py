@@ -1,39 +1,388 @@
 
+import os
+from itertools import islice
+
 from lazor_simulator import LazorSim
-from lazor_blocks import ReflectBlock, OpaqueBlock, RefractBlock
-import itertools
-import copy
 from bff_parser import parse_bff
+from lazor_board import Board, BLOCK_NAMES, CODES
+from lazor_table import TransitionTable
+from lazor_search import BacktrackSearch, backtrack
+from lazor_stats import SearchStats, phase
+from lazor_symmetry import CandidateReducer
+from lazor_candidates import count_placements, iter_placements, search_space, switch_placement
+
+def solve_bff(file_path, backend="backtrack", workers=1, stats=None, cache=None, resume=None,
+              checkpoint_every=5.0):
+    """
+    Parse and solve a .bff file. `cache` is an optional
+    lazor_cache.SolutionCache consulted before solving and updated after.
 
-def solve_bff(file_path):
+    With resume (a checkpoint file path, or True for <name>.checkpoint.json
+    next to the .bff) the search position is saved to that file every
+    `checkpoint_every` seconds, and a search found there is carried on
+    instead of started over (see lazor_checkpoint).
+    """
     parsed = parse_bff(file_path)
-    return solve_board(parsed)
-def solve_board(parsed):
-    grid_template = parsed["grid"]
-    lazors = parsed["lazors"]
-    targets = parsed["targets"]
-    blocks = parsed["blocks"]
-
-    open_spaces = [(x, y) for y, row in enumerate(grid_template)
-                   for x, cell in enumerate(row) if cell == "o"]
-
-    block_list = (
-        [ReflectBlock()] * blocks["A"] +
-        [OpaqueBlock()] * blocks["B"] +
-        [RefractBlock()] * blocks["C"]
-    )
-
-    for perm in itertools.permutations(block_list):
-        for positions in itertools.permutations(open_spaces, len(block_list)):
-            temp_grid = copy.deepcopy(grid_template)
-            for (x, y), block in zip(positions, perm):
-                temp_grid[y][x] = block
-            sim = LazorSim(temp_grid, lazors, targets)
-            if sim.simulate():
-                # ✅ Patch: Return both block placement and paths
-                return (
-                    [(x, y, type(block).__name__) for (x, y), block in zip(positions, perm)],
-                    sim.get_paths()  # ← make sure LazorSim has this method!
-                )
-
-    return None, []  # No solution found
+    checkpoint = None
+    if resume:
+        from lazor_checkpoint import Checkpoint
+        if resume is True:
+            resume = os.path.splitext(file_path)[0] + ".checkpoint.json"
+        checkpoint = Checkpoint(resume, parsed, backend, checkpoint_every)
+    return solve_with_cache(parsed, cache, backend=backend, workers=workers, stats=stats,
+                            checkpoint=checkpoint)
+
+
+def solve_with_cache(parsed, cache, **kwargs):
+    """solve_board(parsed, **kwargs), answered from `cache` when it can be."""
+    if cache is not None:
+        cached = cache.get(parsed)
+        if cached is not None:
+            checkpoint = kwargs.get("checkpoint")
+            if checkpoint is not None:
+                checkpoint.finish()  # left over from a search that is no longer needed
+            return cached
+    solution = solve_board(parsed, **kwargs)
+    if cache is not None and solution[0] is not None:
+        cache.put(parsed, *solution)
+    return solution
+
+
+def solve_with_stats(parsed, **kwargs):
+    """
+    solve_board(parsed, **kwargs) with instrumentation on: returns
+    (placements, paths, stats), stats being a filled-in SearchStats.
+    """
+    stats = SearchStats()
+    placements, paths = solve_board(parsed, stats=stats, **kwargs)
+    return placements, paths, stats
+
+
+def iter_solutions(parsed, backend="sat", stats=None, should_stop=None):
+    """
+    Yield the placements (as solve_board returns them) of every solution,
+    lazily, one per distinct arrangement of the blocks.
+
+    backend "sat" (see lazor_sat) finds solutions one at a time, each new
+    one made to differ from those before; "enumerate" simulates every
+    arrangement in turn, slower but plain. Neither skips mirror images.
+    The listing ends early once should_stop() returns True.
+    """
+    parking, found = _solution_source(parsed, backend, stats, should_stop)
+    for placed, parked in found:
+        for park in iter_placements(parking, parked):
+            yield sorted([(x, y, BLOCK_NAMES[CODES[key]]) for x, y, key in placed]
+                         + [(x, y, BLOCK_NAMES[CODES[key]]) for (x, y), key in park])
+
+
+def count_solutions(parsed, stop_at=None, backend="sat", stats=None, should_stop=None):
+    """
+    The number of solutions iter_solutions() would yield, counting the ways
+    to arrange spare blocks out of every beam's reach without listing them.
+    Stops as soon as the count reaches `stop_at` and returns that, so
+    count_solutions(parsed, stop_at=2) == 1 says the solution is unique.
+    If should_stop() cuts it short, the count so far is returned.
+    """
+    parking, found = _solution_source(parsed, backend, stats, should_stop)
+    count = 0
+    for _, parked in found:
+        count += count_placements(len(parking), parked)
+        if stop_at is not None and count >= stop_at:
+            return stop_at
+    return count
+
+
+def _solution_source(parsed, backend, stats, should_stop=None):
+    # (parking cells, iterator of (placed, parked)) from one backend
+    if backend == "sat":
+        from lazor_sat import LazorModel
+        model = LazorModel(parsed)
+        return model.parking, model.solutions(should_stop, stats)
+    if backend == "enumerate":
+        board = Board.from_grid(parsed["grid"])
+        table = TransitionTable.for_board(board)
+        reducer = CandidateReducer(parsed, board, table)
+        sim = LazorSim(board, parsed["lazors"], parsed["targets"], incremental=True,
+                       table=table, stats=stats)
+        return reducer.irrelevant, _enumerated_solutions(sim, reducer, should_stop, stats)
+    raise ValueError(f"Unknown backend for listing solutions: {backend}")
+
+
+def _enumerated_solutions(sim, reducer, should_stop, stats):
+    parking = set(reducer.irrelevant)
+    for placement in _solved_placements(sim, reducer, should_stop=should_stop, stats=stats,
+                                        mirrors=True):
+        parked = {"A": 0, "B": 0, "C": 0}
+        for cell, key in placement:
+            if cell in parking:
+                parked[key] += 1
+        yield [(x, y, key) for (x, y), key in placement if (x, y) not in parking], parked
+
+
+def solve_board(parsed, backend="backtrack", workers=1, deterministic=False, stats=None,
+                checkpoint=None):
+    """
+    Solve a parsed board and return (placements, paths), or (None, []).
+
+    backend selects the search:
+      - "backtrack": place blocks along the beams, pruning dead ends (default)
+      - "target": backtrack, trying first the blocks that send a beam
+        towards a target not hit yet (see lazor_target)
+      - "sat": encode the board as clauses and hand it to a SAT solver (see
+        lazor_sat); the answer is re-checked with LazorSim
+      - "enumerate": try every distinct arrangement, up to symmetry (see
+        lazor_symmetry); slow
+      - "plain": try every distinct arrangement with no pruning at all;
+        slowest, kept as the reference the other backends are checked against
+      - "batch": enumerate, simulating chunks of arrangements at once with
+        NumPy (see lazor_batch; needs numpy)
+      - "anytime": best-first search that grows the partial board hitting
+        the most targets first (see lazor_anytime; lazor_anytime.best_first
+        adds a time or node budget and returns the best partial board)
+      - "bitboard": enumerate, simulating each arrangement with all beams
+        moved at once on big-integer bitboards (see lazor_bitboard)
+
+    With workers > 1 the search is split by first placement across that
+    many processes (see lazor_parallel). deterministic=True makes the result
+    the one a single process would find.
+
+    Pass a lazor_stats.SearchStats as stats to have it filled in (or use
+    solve_with_stats), starting with the size of the search space; without
+    one nothing is counted or timed.
+
+    A lazor_checkpoint.Checkpoint as checkpoint makes a single-process
+    "backtrack", "target", "enumerate" or "plain" search save its position as it
+    goes and start from the saved one; its file is removed once the search
+    has run to the end.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend: {backend}")
+    if checkpoint is not None:
+        if checkpoint.backend != backend:
+            raise ValueError(f"Checkpoint is for backend {checkpoint.backend}, not {backend}")
+        if workers > 1:
+            raise ValueError("Checkpointed searches run in a single process")
+        checkpoint.restore_stats(stats)
+    if stats is not None:
+        stats.search_space = search_space(parsed)
+    if checkpoint is not None:
+        solution = BACKENDS[backend](parsed, stats=stats, checkpoint=checkpoint)
+        checkpoint.finish()
+        return solution
+    if workers > 1:
+        from lazor_parallel import solve_parallel
+        return solve_parallel(parsed, backend, workers, deterministic, stats)
+    return BACKENDS[backend](parsed, stats=stats)
+
+
+def solve_backtrack(parsed, first=None, should_stop=None, stats=None, checkpoint=None):
+    solution = backtrack(parsed, first, should_stop, stats, checkpoint)
+    if solution is None:
+        return None, []
+    return solution
+
+
+def solve_target(parsed, first=None, should_stop=None, stats=None, checkpoint=None):
+    from lazor_target import target_search
+    solution = target_search(parsed, first, should_stop, stats, checkpoint)
+    if solution is None:
+        return None, []
+    return solution
+
+
+def solve_sat(parsed, first=None, should_stop=None, stats=None):
+    from lazor_sat import sat_solve
+    solution = sat_solve(parsed, should_stop, stats)
+    if solution is None:
+        return None, []
+    return solution
+
+
+def solve_anytime(parsed, first=None, should_stop=None, stats=None):
+    from lazor_anytime import best_first
+    result = best_first(parsed, should_stop=should_stop, stats=stats)
+    if not result.solved:
+        return None, []
+    return result.placements, result.paths
+
+
+def single_shard(parsed):
+    # Backends that do not split: run in one process
+    return None
+
+
+def target_shards(parsed):
+    from lazor_target import TargetSearch
+    return TargetSearch(parsed).root_choices()
+
+
+def backtrack_shards(parsed):
+    # None: the empty board is already solved, no point in sharding
+    return BacktrackSearch(parsed).root_choices()
+
+
+def solve_enumerate(parsed, first=None, should_stop=None, stats=None, checkpoint=None,
+                    reduce=True):
+    # One board and one incremental simulator for the whole run: consecutive
+    # placements share most cells, so only beams reaching a changed cell are
+    # re-traced, and nothing is copied per candidate.
+    def make_sim(board, table):
+        return LazorSim(board, parsed["lazors"], parsed["targets"], incremental=True,
+                        table=table, stats=stats)
+    return _enumerate(parsed, make_sim, first, should_stop, stats, checkpoint, reduce)
+
+
+def solve_plain(parsed, first=None, should_stop=None, stats=None, checkpoint=None):
+    # enumerate without the CandidateReducer rules, so it does not rely on
+    # the pruning it is there to check
+    return solve_enumerate(parsed, first, should_stop, stats, checkpoint, reduce=False)
+
+
+def _enumerate(parsed, make_sim, first=None, should_stop=None, stats=None, checkpoint=None,
+               reduce=True):
+    """
+    Try every distinct arrangement, up to symmetry unless reduce=False, on
+    the simulator make_sim(board, table) returns (anything with set_cell and
+    simulate) and return (placements, paths) for the first that solves the
+    board, or (None, []).
+    """
+    with phase(stats, "setup"):
+        board = Board.from_grid(parsed["grid"])
+        table = TransitionTable.for_board(board)
+        sim = make_sim(board, table)
+        reducer = CandidateReducer(parsed, board, table, stats, reduce)
+    with phase(stats, "search"):
+        solution = next(_solved_placements(sim, reducer, first, should_stop, stats, checkpoint),
+                        None)
+    if solution is None:
+        return None, []  # No solution found
+    with phase(stats, "paths"):
+        solved = Board.from_grid(parsed["grid"])
+        for (x, y), key in solution:
+            solved.place(x, y, CODES[key])
+        return (
+            [(x, y, BLOCK_NAMES[CODES[key]]) for (x, y), key in solution],
+            LazorSim(solved, parsed["lazors"], parsed["targets"], table=table).get_paths()
+        )
+
+
+def _solved_placements(sim, reducer, first=None, should_stop=None, stats=None, checkpoint=None,
+                       mirrors=False):
+    """
+    Yield the reducer's candidate placements that `sim` finds solved, in
+    order. Mirror images of placements already tried are skipped unless
+    `mirrors`. should_stop and the checkpoint are checked every 256
+    candidates; the checkpoint position is the number of candidates tried.
+    """
+    candidates = reducer.candidates(first)
+    skip = (checkpoint.position or 0) if checkpoint is not None else 0
+    if skip:
+        candidates = islice(candidates, skip, None)
+    current = {}
+    for n, placement in enumerate(candidates, skip):
+        if n % 256 == 0:
+            if should_stop is not None and should_stop():
+                return
+            if checkpoint is not None and checkpoint.due():
+                checkpoint.save(n, stats)
+        if stats is not None:
+            stats.generated += 1
+        if not mirrors and reducer.symmetries and not reducer.keep(placement):
+            continue
+        current = switch_placement(sim, current, dict(placement))
+        if stats is not None:
+            stats.candidates += 1
+        if sim.simulate():
+            yield placement
+
+
+def solve_enumerate_batch(parsed, first=None, should_stop=None, stats=None, chunk=1024):
+    from lazor_batch import BatchTable, MAX_TARGETS, placement_grids, simulate_batch
+
+    if len(set(parsed["targets"])) > MAX_TARGETS:
+        # Too many targets for the int64 hit masks: simulate one at a time
+        return solve_enumerate(parsed, first, should_stop, stats)
+    with phase(stats, "setup"):
+        board = Board.from_grid(parsed["grid"])
+        table = TransitionTable.for_board(board)
+        batch_table = BatchTable(table)
+        reducer = CandidateReducer(parsed, board, table, stats)
+        candidates = reducer.candidates(first)
+        if stats is not None:
+            candidates = _counted(candidates, stats)
+        if reducer.symmetries:
+            candidates = filter(reducer.keep, candidates)
+    with phase(stats, "search"):
+        while True:
+            if should_stop is not None and should_stop():
+                return None, []
+            placements = list(islice(candidates, chunk))
+            if not placements:
+                return None, []
+            if stats is not None:
+                stats.candidates += len(placements)
+                stats.simulations += len(placements)
+            solved = simulate_batch(placement_grids(board, placements), parsed["lazors"],
+                                    parsed["targets"], batch_table)
+            if solved.any():
+                placement = placements[int(solved.argmax())]
+                break
+    with phase(stats, "paths"):
+        for (x, y), key in placement:
+            board.place(x, y, CODES[key])
+        sim = LazorSim(board, parsed["lazors"], parsed["targets"], table=table)
+        return (
+            [(x, y, BLOCK_NAMES[CODES[key]]) for (x, y), key in placement],
+            sim.get_paths()
+        )
+
+
+def solve_enumerate_bitboard(parsed, first=None, should_stop=None, stats=None):
+    from lazor_bitboard import BitBoard
+
+    def make_sim(board, table):
+        return BitBoard(board, parsed["lazors"], parsed["targets"], stats=stats)
+    return _enumerate(parsed, make_sim, first, should_stop, stats)
+
+
+def _counted(candidates, stats):
+    for placement in candidates:
+        stats.generated += 1
+        yield placement
+
+
+def enumerate_shards(parsed):
+    if not any(parsed["blocks"].values()):
+        return None
+    return list(range(len(CandidateReducer(parsed).relevant)))
+
+
+def plain_shards(parsed):
+    if not any(parsed["blocks"].values()):
+        return None
+    return list(range(len(Board.from_grid(parsed["grid"]).open_cells())))
+
+
+BACKENDS = {
+    "backtrack": solve_backtrack,
+    "target": solve_target,
+    "sat": solve_sat,
+    "anytime": solve_anytime,
+    "enumerate": solve_enumerate,
+    "plain": solve_plain,
+    "batch": solve_enumerate_batch,
+    "bitboard": solve_enumerate_bitboard,
+}
+
+# How each backend splits its search for lazor_parallel: a list of shard
+# arguments passed as `first`, or None to just run it in one process.
+SHARDS = {
+    "backtrack": backtrack_shards,
+    "target": target_shards,
+    "sat": single_shard,
+    "anytime": single_shard,
+    "enumerate": enumerate_shards,
+    "plain": plain_shards,
+    "batch": enumerate_shards,
+    "bitboard": enumerate_shards,
+}
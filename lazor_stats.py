@@ -0,0 +1,76 @@
+import time
+from contextlib import contextmanager, nullcontext
+
+
+class SearchStats:
+    """Counters a solver fills in while it searches (pass one as stats=)."""
+
+    def __init__(self):
+        self.search_space = 0  # distinct arrangements of the blocks, before any pruning
+        self.reduced_space = 0  # arrangements left once irrelevant cells are pruned (enumerate)
+        self.candidates = 0  # boards, full or partial, that were simulated
+        self.generated = 0  # placements (enumerate) or choices (backtrack) produced
+        self.pruned_reach = 0  # branches cut: some target out of reach of the blocks left
+        self.pruned_irrelevant = 0  # skipped: blocks shuffled among unreachable cells
+        self.pruned_symmetry = 0  # skipped: mirror/rotation of another candidate
+        self.pruned_transposition = 0  # skipped: same blocks already searched in another order
+        self.simulations = 0  # boards traced by LazorSim or simulate_batch
+        self.beam_steps = 0  # beam states traced by LazorSim
+        self.splits = 0  # extra beams started by refract blocks in LazorSim
+        self.seconds = {}  # phase ("setup", "search", "paths") -> time spent
+
+    @property
+    def pruned(self):
+        return (self.pruned_reach + self.pruned_irrelevant + self.pruned_symmetry
+                + self.pruned_transposition)
+
+    def merge(self, other):
+        """Add another SearchStats' counts (and phase times) into this one."""
+        for name, value in vars(other).items():
+            if isinstance(value, dict):
+                mine = getattr(self, name)
+                for key, v in value.items():
+                    mine[key] = mine.get(key, 0) + v
+            else:
+                setattr(self, name, getattr(self, name) + value)
+
+    @classmethod
+    def from_dict(cls, counts):
+        """A SearchStats holding counters saved with as_dict()."""
+        stats = cls()
+        for name, value in vars(stats).items():
+            if name in counts:
+                setattr(stats, name, dict(counts[name]) if isinstance(value, dict) else counts[name])
+        return stats
+
+    def as_dict(self):
+        return dict(vars(self), seconds=dict(self.seconds), pruned=self.pruned)
+
+    def summary(self):
+        """The counters and phase times as a short printable report."""
+        phases = ", ".join(f"{name} {t:.3f}s" for name, t in self.seconds.items())
+        reduced = f", {self.reduced_space} after pruning" if self.reduced_space else ""
+        return (f"search space {self.search_space} arrangements{reduced}\n"
+                f"candidates {self.candidates} (generated {self.generated}, pruned {self.pruned}:"
+                f" reach {self.pruned_reach}, irrelevant {self.pruned_irrelevant},"
+                f" symmetry {self.pruned_symmetry}, transposition {self.pruned_transposition})\n"
+                f"simulations {self.simulations}, beam steps {self.beam_steps},"
+                f" splits {self.splits}\n"
+                f"time: {phases or 'not recorded'}")
+
+
+def phase(stats, name):
+    """
+    Context manager adding the time spent in its block to
+    stats.seconds[name]; does nothing when stats is None.
+    """
+    return nullcontext() if stats is None else _timed(stats, name)
+
+
+@contextmanager
+def _timed(stats, name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.seconds[name] = stats.seconds.get(name, 0.0) + time.perf_counter() - start
@@ -0,0 +1,246 @@
+import mmap
+import os
+import re
+import sys
+import tempfile
+import time
+from collections.abc import Mapping
+
+from lazor_board import Board, LETTERS
+
+# Line that starts each board in a pack; a comment to other .bff readers,
+# so a pack is also a valid concatenation of .bff files.
+HEADER = b"#@bff "
+
+# Files at least this big are memory-mapped rather than read
+MMAP_MIN_BYTES = 1 << 16
+
+_POINT = re.compile(rb"\(([^)]+)\)")
+_CODES = bytes.maketrans(LETTERS.encode(), bytes(range(len(LETTERS))))
+_VALID = bytes(range(len(LETTERS)))
+_FIELDS = ("grid", "blocks", "lazors", "targets", "board")
+
+
+def _lines(data, start, end):
+    # The lines of data[start:end], copying one line at a time
+    while start < end:
+        stop = data.find(b"\n", start, end)
+        stop = end if stop < 0 else stop
+        yield data[start:stop]
+        start = stop + 1
+
+
+def parse_bytes(data, start=0, end=None):
+    """
+    Parse one board's .bff text (bytes, or data[start:end] of a bytes-like
+    buffer such as an mmap) the way bff_parser.parse_bff does, building the
+    Board's cell codes straight from the grid rows. "grid" is left out;
+    LazyBoard makes it from the Board when asked.
+    """
+    rows = []
+    blocks = {"A": 0, "B": 0, "C": 0}
+    lazors = []
+    targets = []
+    in_grid = False
+    for raw in _lines(data, start, len(data) if end is None else end):
+        line = raw.strip()
+        if not line or raw.startswith(b"#"):
+            continue
+        if in_grid:
+            if line == b"GRID STOP":
+                in_grid = False
+            else:
+                rows.append(line.replace(b" ", b"").replace(b"\t", b"").translate(_CODES))
+        elif line == b"GRID START":
+            in_grid = True
+        elif line[:1] in (b"A", b"B", b"C"):
+            key, val = line.split()
+            blocks[key.decode()] = int(val)
+        elif line[:1] == b"L":
+            parts = list(map(int, line.split()[1:]))
+            lazors.append({"position": (parts[0], parts[1]), "direction": (parts[2], parts[3])})
+        elif line[:1] == b"P":
+            match = _POINT.search(line)
+            if match:
+                x, y = map(int, match.group(1).split(b","))
+                targets.append((x * 2, y * 2))
+
+    board = Board(len(rows[0]) if rows else 0, len(rows))
+    cells = b"".join(rows)
+    if len(cells) != board.width * board.height or cells.translate(None, _VALID):
+        raise ValueError("Bad GRID: rows must be equal-length runs of o, x, A, B, C")
+    board.cells[:] = cells
+    return {"blocks": blocks, "lazors": lazors, "targets": targets, "board": board}
+
+
+class LazyBoard(Mapping):
+    """
+    One board of a stream, parsed the first time one of its fields is read.
+
+    Reads like parse_bff's dict ("grid", "blocks", "lazors", "targets") plus
+    "board", the parsed lazor_board.Board. Until then it only holds where
+    its text sits in the (memory-mapped) file.
+    """
+
+    __slots__ = ("name", "_source", "_start", "_end", "_fields")
+
+    def __init__(self, name, source, start=0, end=None):
+        self.name = name
+        self._source = source
+        self._start = start
+        self._end = len(source) if end is None else end
+        self._fields = None
+
+    def text(self):
+        """The board's raw .bff bytes."""
+        return self._source[self._start:self._end]
+
+    def __getitem__(self, key):
+        if self._fields is None:
+            self._fields = parse_bytes(self._source, self._start, self._end)
+        if key == "grid" and "grid" not in self._fields:
+            self._fields["grid"] = self._fields["board"].to_grid()
+        return self._fields[key]
+
+    def __iter__(self):
+        return iter(_FIELDS)
+
+    def __len__(self):
+        return len(_FIELDS)
+
+    def __reduce__(self):
+        # Sent to other processes as a plain, already parsed dict
+        return dict, (dict(self.items()),)
+
+    def __repr__(self):
+        state = "parsed" if self._fields is not None else "unparsed"
+        return f"LazyBoard({self.name!r}, {state})"
+
+
+def _map(path):
+    # Small files are cheaper to read than to map
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size < MMAP_MIN_BYTES:
+            return f.read()
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def iter_boards(path):
+    """
+    Yield a LazyBoard for every board in `path`, memory-mapped, without
+    parsing any of them.
+
+    A pack (see write_pack) is split at its header lines. A file without
+    them is split before each GRID START line, which suits .bff files that
+    put their block, lazor and point lines after the grid; a single .bff
+    file gives one board.
+    """
+    data = _map(path)
+    name = os.path.basename(path)
+    starts = [m.start() for m in re.finditer(rb"(?m)^" + re.escape(HEADER), data)]
+    if starts:
+        for i, start in enumerate(starts):
+            line_end = data.find(b"\n", start)
+            line_end = len(data) if line_end < 0 else line_end
+            label = data[start + len(HEADER):line_end].strip().decode()
+            end = starts[i + 1] if i + 1 < len(starts) else len(data)
+            yield LazyBoard(label, data, line_end, end)
+        return
+    starts = [m.start() for m in re.finditer(rb"(?m)^[ \t]*GRID START", data)]
+    if len(starts) <= 1:
+        if re.search(rb"\S", data):
+            yield LazyBoard(name, data)
+        return
+    starts[0] = 0
+    for i, start in enumerate(starts):
+        end = starts[i + 1] if i + 1 < len(starts) else len(data)
+        yield LazyBoard(f"{name}#{i}", data, start, end)
+
+
+def _expand(paths):
+    if isinstance(paths, (str, os.PathLike)):
+        paths = [paths]
+    for path in paths:
+        if os.path.isdir(path):
+            for f in sorted(os.listdir(path)):
+                if f.endswith(".bff"):
+                    yield os.path.join(path, f)
+        else:
+            yield path
+
+
+def load_many(paths):
+    """
+    List a LazyBoard for every board in `paths`: .bff files, packs,
+    concatenated files or folders of .bff files. Nothing is parsed until a
+    board's fields are read.
+    """
+    return [board for path in _expand(paths) for board in iter_boards(path)]
+
+
+def write_pack(paths, pack_path):
+    """Concatenate .bff files (or folders of them) into one pack file; returns the board count."""
+    count = 0
+    with open(pack_path, "wb") as out:
+        for path in _expand(paths):
+            with open(path, "rb") as f:
+                text = f.read()
+            out.write(HEADER + os.path.basename(path).encode() + b"\n")
+            out.write(text if text.endswith(b"\n") else text + b"\n")
+            count += 1
+    return count
+
+
+def benchmark(paths, repeat=3):
+    """
+    Time parsing every board in `paths` (.bff files or folders) with
+    bff_parser.parse_bff, Version 2's readbff (if numpy is there), and
+    load_many, both lazily and with every board parsed, from the files and
+    from one pack of them. Returns the best
+    of `repeat` runs in seconds for each parser that could read every file
+    (readbff only understands "P x y" point lines).
+    """
+    from bff_parser import parse_bff
+
+    files = list(_expand(paths))
+    pack = tempfile.NamedTemporaryFile(suffix=".bffpack", delete=False)
+    pack.close()
+    version2 = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            "Version2_with_visualization")
+    sys.path.append(version2)
+    try:
+        write_pack(files, pack.name)
+        parsers = {
+            "parse_bff": lambda: [parse_bff(p) for p in files],
+            "load_many (lazy)": lambda: load_many(files),
+            "load_many (parsed)": lambda: [b["board"] for b in load_many(files)],
+            "pack (lazy)": lambda: load_many(pack.name),
+            "pack (parsed)": lambda: [b["board"] for b in load_many(pack.name)],
+        }
+        try:
+            from file_reader import readbff
+            parsers["readbff (Version 2)"] = lambda: [readbff(p) for p in files]
+        except ImportError:
+            pass
+
+        results = {}
+        for label, run in parsers.items():
+            best = float("inf")
+            try:
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    run()
+                    best = min(best, time.perf_counter() - start)
+            except (ValueError, IndexError, AttributeError):
+                continue
+            results[label] = best
+        return results
+    finally:
+        sys.path.remove(version2)
+        os.remove(pack.name)
+
+
+if __name__ == "__main__":
+    # python lazor_stream.py FOLDER_OR_FILES...
+    for label, seconds in benchmark(sys.argv[1:] or ["."]).items():
+        print(f"{label:22s} {seconds * 1000:9.2f} ms")
@@ -0,0 +1,136 @@
+from lazor_board import Board
+from lazor_candidates import count_placements, iter_placements
+from lazor_reach import split_open_cells
+from lazor_stats import SearchStats
+
+
+class Symmetry:
+    """
+    A mirror or rotation of the board's lattice:
+    (x, y) -> (a*x + b*y + e, c*x + d*y + f).
+    """
+
+    def __init__(self, name, a, b, c, d, e, f):
+        self.name = name
+        self.m = (a, b, c, d)
+        self.offset = (e, f)
+
+    def point(self, p):
+        (a, b, c, d), (e, f) = self.m, self.offset
+        return a * p[0] + b * p[1] + e, c * p[0] + d * p[1] + f
+
+    def direction(self, v):
+        a, b, c, d = self.m
+        return a * v[0] + b * v[1], c * v[0] + d * v[1]
+
+    def cell(self, cell):
+        x, y = self.point((2 * cell[0] + 1, 2 * cell[1] + 1))
+        return (x - 1) // 2, (y - 1) // 2
+
+    def placement(self, placement):
+        """Image of a tuple of ((x, y), key) pairs."""
+        return tuple((self.cell(c), key) for c, key in placement)
+
+    def __repr__(self):
+        return f"Symmetry({self.name})"
+
+
+def lattice_symmetries(width, height):
+    """Every non-identity mirror/rotation of a width x height board."""
+    w, h = 2 * width, 2 * height
+    syms = [
+        Symmetry("mirror-x", -1, 0, 0, 1, w, 0),
+        Symmetry("mirror-y", 1, 0, 0, -1, 0, h),
+        Symmetry("rotate-180", -1, 0, 0, -1, w, h),
+    ]
+    if width == height:
+        syms += [
+            Symmetry("transpose", 0, 1, 1, 0, 0, 0),
+            Symmetry("anti-transpose", 0, -1, -1, 0, w, h),
+            Symmetry("rotate-90", 0, -1, 1, 0, w, 0),
+            Symmetry("rotate-270", 0, 1, -1, 0, 0, h),
+        ]
+    return syms
+
+
+def board_symmetries(parsed, board=None):
+    """
+    The lattice symmetries that map the grid, the lazors and the targets
+    onto themselves. Blocks act the same whichever way a beam comes in,
+    so any placement and its image are equally good.
+    """
+    board = board or Board.from_grid(parsed["grid"])
+    lazors = {(l["position"], l["direction"]) for l in parsed["lazors"]}
+    targets = set(parsed["targets"])
+    found = []
+    for sym in lattice_symmetries(board.width, board.height):
+        if any(board.get(x, y) != board.get(*sym.cell((x, y)))
+               for y in range(board.height) for x in range(board.width)):
+            continue
+        if {(sym.point(p), sym.direction(d)) for p, d in lazors} != lazors:
+            continue
+        if {sym.point(t) for t in targets} != targets:
+            continue
+        found.append(sym)
+    return found
+
+
+class CandidateReducer:
+    """
+    Generates one representative per class of equivalent placements,
+    counting what each rule removed in `stats` (pruned_irrelevant,
+    pruned_symmetry).
+
+      - irrelevant: open cells no beam can reach under any arrangement of
+        the blocks (see lazor_reach.split_open_cells). Which blocks sit in
+        which of them cannot matter, so candidates() only yields the
+        arrangement that fills them in order with keys sorted.
+      - symmetry: keep() is True only for the smallest of a placement's
+        images under the board's symmetries.
+
+    With reduce=False neither rule applies and every arrangement of the
+    blocks over the open cells is a candidate.
+    """
+
+    def __init__(self, parsed, board=None, table=None, stats=None, reduce=True):
+        board = board or Board.from_grid(parsed["grid"])
+        self.blocks = parsed["blocks"]
+        self.stats = stats if stats is not None else SearchStats()
+        if reduce:
+            self.symmetries = board_symmetries(parsed, board)
+            self.relevant, self.irrelevant = split_open_cells(
+                board, parsed["lazors"], self.blocks, table)
+        else:
+            self.symmetries = []
+            self.relevant, self.irrelevant = board.open_cells(), []
+
+    def candidates(self, first=None):
+        """
+        iter_placements() over the relevant cells, parking leftover blocks
+        in the irrelevant ones; `first` shards over self.relevant.
+        """
+        if first in (None, 0):
+            n_open = len(self.relevant) + len(self.irrelevant)
+            reduced = count_placements(len(self.relevant), self.blocks, len(self.irrelevant))
+            # Sizes, not running totals: set, so a resumed search counts them once
+            self.stats.reduced_space = reduced
+            self.stats.pruned_irrelevant = count_placements(n_open, self.blocks) - reduced
+        return iter_placements(self.relevant, self.blocks, first, self.irrelevant)
+
+    def normalise(self, placement):
+        """Sorted placement with its blocks in irrelevant cells moved to the representative spots."""
+        if not self.irrelevant:
+            return tuple(sorted(placement))
+        irrelevant = set(self.irrelevant)
+        kept = [pair for pair in placement if pair[0] not in irrelevant]
+        parked = sorted(key for cell, key in placement if cell in irrelevant)
+        return tuple(sorted(kept + list(zip(self.irrelevant, parked))))
+
+    def keep(self, placement):
+        """True if no symmetry maps `placement` onto a smaller equivalent one."""
+        canonical = self.normalise(placement)
+        for sym in self.symmetries:
+            if self.normalise(sym.placement(placement)) < canonical:
+                self.stats.pruned_symmetry += 1
+                return False
+        return True
@@ -0,0 +1,124 @@
+from functools import lru_cache
+
+from lazor_board import DIRECTIONS, LETTERS, TURNS, OPAQUE, REFLECT, REFRACT
+
+# Physics the table can be built for
+CENTRE = "centre"   # blocks act when a beam passes a cell centre (LazorSim)
+EDGE = "edge"       # blocks act on the beam bouncing off a cell edge (Version 2)
+
+EXIT = -2           # probe value of a state whose beam has left the board
+NO_CELL = -1        # probe value of a state that is not looking at any cell
+
+
+class TransitionTable:
+    """
+    Every beam move on a board's half-step lattice, worked out once.
+
+    A beam state is an int encoding a lattice point and the direction the
+    beam is travelling in. The lattice runs from -1 to 2 * width + 1 (and
+    likewise in y) so the first point off the board still has a state.
+
+      probe[s]       index (y * width + x) of the cell whose content decides
+                     what happens next, NO_CELL, or EXIT if the beam stops
+      moves[s][code] tuple of next states when that cell holds `code`
+      points[s]      the (x, y) lattice point of s
+
+    A tracer therefore only does lookups:
+        code = cells[probe[s]] if probe[s] >= 0 else OPEN
+        next_states = moves[s][code]
+    """
+
+    def __init__(self, width, height, physics=CENTRE):
+        if physics not in (CENTRE, EDGE):
+            raise ValueError(f"Unknown physics: {physics}")
+        self.width = width
+        self.height = height
+        self.physics = physics
+        self.span = 2 * width + 3
+        self.size = self.span * (2 * height + 3) * 4
+
+        self.points = [None] * self.size
+        self.probe = [EXIT] * self.size
+        self.moves = [((),) * len(LETTERS)] * self.size
+        self.cell_xy = [(i % width, i // width) for i in range(width * height)]
+
+        build = self._centre_state if physics == CENTRE else self._edge_state
+        for y in range(-1, 2 * height + 2):
+            for x in range(-1, 2 * width + 2):
+                for d in DIRECTIONS:
+                    s = self.state(x, y, d)
+                    self.points[s] = (x, y)
+                    build(s, x, y, d)
+
+    @classmethod
+    def for_board(cls, board, physics=CENTRE):
+        """Shared table for boards of this size (tables depend only on size)."""
+        return _cached_table(board.width, board.height, physics)
+
+    def state(self, x, y, direction):
+        """State of a beam at (x, y) moving in `direction`, or None if off the lattice."""
+        if not (-1 <= x <= 2 * self.width + 1 and -1 <= y <= 2 * self.height + 1):
+            return None
+        return ((y + 1) * self.span + x + 1) * 4 + DIRECTIONS.index(direction)
+
+    def direction(self, s):
+        return DIRECTIONS[s % 4]
+
+    def _step(self, x, y, d):
+        # Next state after moving one step from (x, y) in direction d
+        return self.state(x + d[0], y + d[1], d)
+
+    def _on_board(self, x, y):
+        return 0 <= x <= 2 * self.width and 0 <= y <= 2 * self.height
+
+    def _cell(self, x, y):
+        # Cell index whose centre is (x, y), or NO_CELL
+        if x % 2 == 1 and y % 2 == 1:
+            cx, cy = (x - 1) // 2, (y - 1) // 2
+            if 0 <= cx < self.width and 0 <= cy < self.height:
+                return cy * self.width + cx
+        return NO_CELL
+
+    def _centre_state(self, s, x, y, d):
+        # LazorSim: the block at the centre the beam has just reached acts on it
+        if not self._on_board(x, y):
+            return
+        cell = self._cell(x, y)
+        self.probe[s] = cell
+        straight = (self._step(x, y, d),)
+        if cell == NO_CELL:
+            self.moves[s] = (straight,) * len(LETTERS)
+            return
+        self.moves[s] = tuple(
+            tuple(self._step(x, y, nd) for nd in TURNS[code][d])
+            if TURNS[code] is not None else straight
+            for code in range(len(LETTERS)))
+
+    def _edge_state(self, s, x, y, d):
+        # Version 2: a beam sitting on a cell edge looks at the cell across it
+        # and bounces off a reflect block by flipping one axis.
+        dx, dy = d
+        w, h = 2 * self.width, 2 * self.height
+        if not self._on_board(x, y):
+            return
+        if (x == w and dx == 1) or (x == 0 and dx == -1) \
+                or (y == h and dy == 1) or (y == 0 and dy == -1):
+            return
+        if y % 2 == 1 or x % 2 == 0:
+            cell, flipped = self._cell(x + dx, y), (-dx, dy)
+        else:
+            cell, flipped = self._cell(x, y + dy), (dx, -dy)
+        self.probe[s] = cell
+        straight = self._step(x, y, d)
+        bounce = self._step(x, y, flipped)
+        moves = [(straight,)] * len(LETTERS)
+        if cell != NO_CELL:
+            moves[REFLECT] = (bounce,)
+            moves[OPAQUE] = ()
+            moves[REFRACT] = (straight, bounce)
+        self.moves[s] = tuple(moves)
+
+
+@lru_cache(maxsize=32)
+def _cached_table(width, height, physics):
+    return TransitionTable(width, height, physics)
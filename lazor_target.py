@@ -0,0 +1,112 @@
+from collections import deque
+
+from lazor_board import Board, CODES, OPEN
+from lazor_search import BacktrackSearch
+from lazor_table import TransitionTable
+
+FAR = 255  # distance of a state that cannot reach the target within the limit
+
+
+def predecessors(board, inventory, table):
+    """
+    The table's moves reversed: preds[t] lists (s, cost) for every state s
+    that can move to t, cost being 1 if it takes a block from `inventory`
+    put into the open cell s looks at, else 0.
+    """
+    probe, moves = table.probe, table.moves
+    cells = board.cells
+    spare = [CODES[k] for k, n in inventory.items() if n > 0]
+    preds = [[] for _ in range(table.size)]
+    for s in range(table.size):
+        c = probe[s]
+        code = cells[c] if c >= 0 else OPEN
+        for t in moves[s][code]:
+            preds[t].append((s, 0))
+        if c >= 0 and code == OPEN:
+            for code in spare:
+                for t in moves[s][code]:
+                    preds[t].append((s, 1))
+    return preds
+
+
+def target_distances(board, targets, inventory, table=None, preds=None):
+    """
+    Search backwards from each target point over the lattice lines through
+    it: returns {target: bytearray}, byte s being the fewest blocks a beam
+    in state s needs placed in open cells to go on and hit the target, or
+    FAR if that takes more blocks than `inventory` holds.
+
+    Block types are limited to those left in `inventory`, not their counts,
+    so a distance can be optimistic, never too high.
+    """
+    if not isinstance(board, Board):
+        board = Board.from_grid(board)
+    table = table or TransitionTable.for_board(board)
+    preds = preds or predecessors(board, inventory, table)
+    limit = min(sum(inventory.values()), FAR - 1)
+    points = table.points
+    ends = {}
+    for s in range(table.size):
+        ends.setdefault(points[s], []).append(s)
+
+    distances = {}
+    for target in targets:
+        dist = bytearray([FAR]) * table.size
+        queue = deque()
+        for s in ends.get(target, ()):
+            dist[s] = 0
+            queue.append(s)
+        # 0-1 breadth-first search: free moves go to the front of the queue
+        while queue:
+            t = queue.popleft()
+            d = dist[t]
+            for s, cost in preds[t]:
+                nd = d + cost
+                if nd < dist[s] and nd <= limit:
+                    dist[s] = nd
+                    if cost:
+                        queue.append(s)
+                    else:
+                        queue.appendleft(s)
+        distances[target] = dist
+    return distances
+
+
+class TargetSearch(BacktrackSearch):
+    """
+    BacktrackSearch that tries first the blocks that turn a beam onto a
+    line leading to a target it has not hit yet.
+
+    Forward, the beams are traced as usual and blocks only go into cells
+    they cross; backward, target_distances says how many more blocks a
+    beam needs from each state to reach each target. Each choice is scored
+    by the distances of the states the block sends the beam into, summed
+    over the unhit targets, and the lowest score is tried first. Only the
+    order changes, so the search finds a solution whenever
+    BacktrackSearch does, usually after far fewer boards.
+    """
+
+    def __init__(self, parsed, should_stop=None, stats=None, checkpoint=None):
+        super().__init__(parsed, should_stop, stats, checkpoint=checkpoint)
+        self.distances = target_distances(self.board, self.sim.target_list, self.inventory,
+                                          self.sim.table)
+
+    def _choices(self):
+        probes = self.sim.probing_states()
+        moves = self.sim.table.moves
+        width = self.board.width
+        unhit = [self.distances[t] for t in self.sim.target_list
+                 if t not in self.sim.hit_targets]
+        scored = []
+        for x, y, key in super()._choices():
+            code = CODES[key]
+            outs = [n for s in probes.get(y * width + x, ()) for n in moves[s][code]]
+            score = sum(min((dist[n] for n in outs), default=FAR) for dist in unhit)
+            scored.append((score, len(scored), (x, y, key)))
+        scored.sort()
+        return [choice for _, _, choice in scored]
+
+
+def target_search(parsed, first=None, should_stop=None, stats=None, checkpoint=None):
+    """Run a TargetSearch; returns (placements, paths) or None."""
+    return TargetSearch(parsed, should_stop, stats, checkpoint).solve(first)
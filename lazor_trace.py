@@ -0,0 +1,55 @@
+from collections import deque, namedtuple
+
+from lazor_board import OPEN
+
+# One straight run of a beam: the lazor it came from, the point it starts at
+# (the lazor's position or the point where it split off; None to start at
+# the first state's own point) and the table states it went through.
+Beam = namedtuple("Beam", "lazor origin states")
+
+# Outcome of trace_beams(). `visited` lists every state processed, in order;
+# `truncated` is True if a limit stopped the trace early.
+Trace = namedtuple("Trace", "beams visited truncated")
+
+
+def trace_beams(table, cells, starts, max_steps=None, max_beams=None):
+    """
+    Follow beams through a TransitionTable over a list of cell codes.
+
+    `starts` holds one (origin, state) pair per lazor. Beams wait in a
+    deque; when one splits, it carries on along its first next state and
+    the others are queued. Every state is processed once across all beams,
+    so a beam that reaches a state already seen (a loop, or another beam's
+    path) ends there, and the trace always finishes. `max_steps` (states
+    processed) and `max_beams` (beams started) optionally cut it short.
+    """
+    probe, moves, points = table.probe, table.moves, table.points
+    seen = bytearray(table.size)
+    beams = []
+    visited = []
+    queue = deque((i, origin, s) for i, (origin, s) in enumerate(starts))
+    truncated = False
+    while queue and not truncated:
+        if max_beams is not None and len(beams) >= max_beams:
+            truncated = True
+            break
+        lazor, origin, s = queue.popleft()
+        states = []
+        beams.append(Beam(lazor, origin, states))
+        while True:
+            states.append(s)
+            if seen[s]:
+                break
+            if max_steps is not None and len(visited) >= max_steps:
+                truncated = True
+                break
+            seen[s] = 1
+            visited.append(s)
+            c = probe[s]
+            next_states = moves[s][cells[c] if c >= 0 else OPEN]
+            if not next_states:
+                break  # absorbed, or off the board
+            for t in next_states[1:]:
+                queue.append((lazor, points[s], t))
+            s = next_states[0]
+    return Trace(beams, visited, truncated)
@@ -0,0 +1,79 @@
+import random
+from collections import OrderedDict
+
+LRU = "lru"
+DEPTH = "depth"
+
+
+class Zobrist:
+    """
+    Zobrist hashing of partial placements: every (cell index, cell code)
+    gets a random 64-bit key, and a board's hash is the XOR of the keys of
+    its placed blocks. Placing or removing a block is one XOR, and boards
+    with the same blocks in the same cells hash the same whatever order
+    they were placed in.
+    """
+
+    def __init__(self, n_cells, n_codes, seed=0):
+        rng = random.Random(seed)
+        self.keys = [[rng.getrandbits(64) for _ in range(n_codes)] for _ in range(n_cells)]
+
+    def key(self, cell, code):
+        return self.keys[cell][code]
+
+
+class TranspositionTable:
+    """
+    Bounded set of the Zobrist hashes of partial boards whose subtree was
+    searched without finding a solution, so a board reached again by
+    placing the same blocks in another order is neither re-simulated nor
+    expanded again.
+
+    Each hash is stored with its depth, the blocks still to place below
+    that board; get() returns it, or None for a board not in the table.
+    With policy LRU the least recently used entry goes when the table is
+    full. With DEPTH it is a fixed array of slots indexed by hash, and a
+    new entry only replaces a slot's old one if it has at least as many
+    blocks left to place, keeping the subtrees that cost most to redo.
+    """
+
+    def __init__(self, max_entries=1 << 16, policy=LRU):
+        if policy not in (LRU, DEPTH):
+            raise ValueError(f"Unknown eviction policy: {policy}")
+        self.max_entries = max_entries
+        self.policy = policy
+        self.hits = 0
+        if policy == LRU:
+            self._entries = OrderedDict()
+        else:
+            self._slots = [None] * max_entries
+
+    def get(self, h):
+        """The depth stored for hash h, or None."""
+        if self.policy == LRU:
+            depth = self._entries.get(h)
+            if depth is not None:
+                self._entries.move_to_end(h)
+        else:
+            slot = self._slots[h % self.max_entries]
+            depth = slot[1] if slot is not None and slot[0] == h else None
+        if depth is not None:
+            self.hits += 1
+        return depth
+
+    def put(self, h, depth):
+        if self.policy == LRU:
+            self._entries[h] = depth
+            self._entries.move_to_end(h)
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        else:
+            i = h % self.max_entries
+            slot = self._slots[i]
+            if slot is None or slot[0] == h or slot[1] <= depth:
+                self._slots[i] = (h, depth)
+
+    def __len__(self):
+        if self.policy == LRU:
+            return len(self._entries)
+        return sum(slot is not None for slot in self._slots)
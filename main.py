@@ -1,5 +1,12 @@
+import json
+import multiprocessing
 import os
-from lazor_solver import solve_bff          # returns (block_placements, lazor_paths) or None
+import time
+from multiprocessing.connection import wait
+from lazor_solver import solve_board, solve_with_cache   # return (block_placements, lazor_paths)
+from lazor_anytime import best_first
+from lazor_cache import SolutionCache
+from lazor_stats import SearchStats
 from bff_parser import parse_bff            # returns dict with keys: 'grid', 'lasers', 'targets'
 try:
     from visualize import draw_board_with_targets  # optional; may or may not accept out_png
@@ -90,53 +97,179 @@ def pretty_print_placements(block_placements):
         print(f"  {block_type} at ({a}, {b})")
 
 
-def solve_all_bff_in_folder(folder='.', visualize_png=False):
+def write_solution_outputs(path, parsed, block_placements, lazor_paths, visualize_png=False):
+    """Print a solved board and write its _solution.txt (and PNG if asked)."""
+    grid = parsed['grid']     # assumed list[list[str]]
+    final_grid = build_solution_grid(grid, block_placements)
+
+    pretty_print_placements(block_placements)
+    print("solution grid:")
+    print_grid(final_grid)
+
+    # ---- NEW: write a .txt solution file next to the .bff
+    save_solution_to_file(path, block_placements, final_grid)
+
+    # Optional visualization if your function supports it
+    if visualize_png and HAVE_VIZ:
+        try:
+            out_png = os.path.splitext(path)[0] + "_solution.png"
+            # Some visualize modules don't accept out_png; the try/except keeps us safe.
+            draw_board_with_targets(final_grid, lazor_paths, parsed.get('targets', set()), out_png=out_png)
+            print(f"Wrote {out_png}")
+        except TypeError:
+            # Fall back to a no-kw-call if signature is (grid, paths, targets)
+            try:
+                draw_board_with_targets(final_grid, lazor_paths, parsed.get('targets', set()))
+                print("(visualize) drew image (no save path supported by visualize.py)")
+            except Exception as viz_e2:
+                print(f"(visualize) skipped: {viz_e2}")
+        except Exception as viz_e:
+            print(f"(visualize) skipped: {viz_e}")
+
+
+def solve_all_bff_in_folder(folder='.', visualize_png=False, cache_path=None, show_stats=False):
+    """
+    Solve every .bff in `folder` one after another. With cache_path, solved
+    boards are stored in (and answered from) that SolutionCache file. With
+    show_stats, each board's search statistics (see lazor_stats) are printed.
+    """
     any_found = False
+    cache = SolutionCache(cache_path) if cache_path else None
     for filename in sorted(os.listdir(folder)):
         if not filename.endswith('.bff'):
             continue
         path = os.path.join(folder, filename)
         print(f"Solving {filename}...")
         try:
-            solution = solve_bff(path)   # pass the full path
-            if solution:
+            parsed = parse_bff(path)     # parsed once, for solving and output
+            stats = SearchStats() if show_stats else None
+            block_placements, lazor_paths = solve_with_cache(parsed, cache, stats=stats)
+            if stats is not None:
+                print(stats.summary())
+            if block_placements is not None:
                 any_found = True
-                block_placements, lazor_paths = solution
-                parsed = parse_bff(path)  # full path again
-                grid = parsed['grid']     # assumed list[list[str]]
-                final_grid = build_solution_grid(grid, block_placements)
-
-                pretty_print_placements(block_placements)
-                print("solution grid:")
-                print_grid(final_grid)
-
-                # ---- NEW: write a .txt solution file next to the .bff
-                save_solution_to_file(path, block_placements, final_grid)
-
-                # Optional visualization if your function supports it
-                if visualize_png and HAVE_VIZ:
-                    try:
-                        out_png = os.path.splitext(path)[0] + "_solution.png"
-                        # Some visualize modules don't accept out_png; the try/except keeps us safe.
-                        draw_board_with_targets(final_grid, lazor_paths, parsed.get('targets', set()), out_png=out_png)
-                        print(f"Wrote {out_png}")
-                    except TypeError:
-                        # Fall back to a no-kw-call if signature is (grid, paths, targets)
-                        try:
-                            draw_board_with_targets(final_grid, lazor_paths, parsed.get('targets', set()))
-                            print("(visualize) drew image (no save path supported by visualize.py)")
-                        except Exception as viz_e2:
-                            print(f"(visualize) skipped: {viz_e2}")
-                    except Exception as viz_e:
-                        print(f"(visualize) skipped: {viz_e}")
+                write_solution_outputs(path, parsed, block_placements, lazor_paths, visualize_png)
             else:
                 print(f"No solution found for {filename}")
         except Exception as e:
             print(f"Failed to solve {filename}: {e}")
+    if cache is not None:
+        cache.close()
     if not any_found:
         print("No .bff files solved.")
 
 
+def _batch_worker(path, backend, conn, cache_path=None, budget=None):
+    """Solve one board in a child process and send the outcome back on conn."""
+    start = time.monotonic()
+    stats = SearchStats()
+    result = {"file": os.path.basename(path)}
+    try:
+        parsed = parse_bff(path)
+        if budget is not None:
+            found = best_first(parsed, time_limit=budget, stats=stats)
+            block_placements, lazor_paths = found.placements, found.paths
+            if found.solved:
+                result["status"] = "solved"
+            else:
+                result["status"] = "unsolved" if found.exhausted else "partial"
+                result["hit_ratio"] = found.hit_ratio
+        elif cache_path:
+            with SolutionCache(cache_path) as cache:
+                block_placements, lazor_paths = solve_with_cache(parsed, cache, backend=backend,
+                                                                 stats=stats)
+        else:
+            block_placements, lazor_paths = solve_board(parsed, backend=backend, stats=stats)
+        result.setdefault("status", "solved" if block_placements is not None else "unsolved")
+        result.update(parsed=parsed, placements=block_placements, paths=lazor_paths)
+    except Exception as e:
+        result.update(status="error", error=str(e))
+    result.update(seconds=time.monotonic() - start, candidates=stats.candidates,
+                  stats=stats.as_dict())
+    conn.send(result)
+    conn.close()
+
+
+def solve_batch(folder='.', workers=None, timeout=60.0, manifest='solve_manifest.json',
+                visualize_png=False, backend='backtrack', cache_path=None, budget=None):
+    """
+    Solve every .bff in `folder`, up to `workers` boards at a time, each in
+    its own process so a board that runs past `timeout` seconds can be
+    killed without holding up the rest.
+
+    Results are printed and written out as each board finishes, and a JSON
+    manifest with each board's status (solved / unsolved / timeout / error),
+    time, candidates explored and full search statistics is saved to
+    `manifest` in the folder.
+    With cache_path, boards already in that SolutionCache are answered from
+    it (they show up with 0 candidates).
+    With budget (seconds, below timeout), each board gets a best-first search
+    (see lazor_anytime) that stops when the budget runs out; boards it did
+    not solve are "partial", with the hit_ratio of the best partial board
+    in the manifest. Returns the manifest entries.
+    """
+    pending = [os.path.join(folder, f) for f in sorted(os.listdir(folder)) if f.endswith('.bff')]
+    workers = workers or os.cpu_count() or 1
+    running = {}   # receiving connection -> (path, process, start time)
+    entries = []
+    batch_start = time.monotonic()
+
+    def finish(conn, result):
+        path, proc, started = running.pop(conn)
+        conn.close()
+        proc.join()
+        entry = {key: result[key] for key in ('file', 'status', 'seconds', 'candidates', 'hit_ratio',
+                                              'stats', 'error')
+                 if result.get(key) is not None}
+        entries.append(entry)
+        print(f"[{len(entries)}/{len(entries) + len(running) + len(pending)}] "
+              f"{entry['file']}: {entry['status']} in {entry['seconds']:.2f}s")
+        if entry['status'] == 'solved':
+            write_solution_outputs(path, result['parsed'], result['placements'],
+                                   result['paths'], visualize_png)
+
+    while pending or running:
+        while pending and len(running) < workers:
+            path = pending.pop(0)
+            recv_conn, send_conn = multiprocessing.Pipe(duplex=False)
+            proc = multiprocessing.Process(target=_batch_worker,
+                                           args=(path, backend, send_conn, cache_path, budget))
+            proc.start()
+            send_conn.close()  # so a worker that dies shows up as EOF
+            running[recv_conn] = (path, proc, time.monotonic())
+
+        next_deadline = min(started + timeout for _, _, started in running.values())
+        ready = wait(list(running), timeout=max(0.0, next_deadline - time.monotonic()))
+        for conn in ready:
+            path, _, started = running[conn]
+            try:
+                result = conn.recv()
+            except EOFError:
+                result = {'status': 'error', 'error': 'worker exited without a result'}
+            result.setdefault('file', os.path.basename(path))
+            result.setdefault('seconds', time.monotonic() - started)
+            finish(conn, result)
+
+        now = time.monotonic()
+        for conn, (path, proc, started) in list(running.items()):
+            if now - started >= timeout:
+                proc.terminate()
+                finish(conn, {'file': os.path.basename(path), 'status': 'timeout',
+                              'seconds': now - started})
+
+    summary = {
+        'boards': entries,
+        'solved': sum(e['status'] == 'solved' for e in entries),
+        'total': len(entries),
+        'seconds': time.monotonic() - batch_start,
+        'timeout': timeout,
+    }
+    with open(os.path.join(folder, manifest), 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2)
+    print(f"Solved {summary['solved']}/{summary['total']} boards in {summary['seconds']:.1f}s")
+    return entries
+
+
 if __name__ == '__main__':
     # Change folder if your .bff files live elsewhere, e.g. 'Lazor Project/boards'
     solve_all_bff_in_folder(folder='.', visualize_png=True)
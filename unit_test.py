@@ -8,7 +8,41 @@ sys.path.append(os.path.dirname(__file__))
 
 from main import build_solution_grid, save_solution_to_file
 from bff_parser import parse_bff
-from lazor_solver import solve_bff
+from lazor_solver import solve_bff, solve_board, solve_with_stats, iter_solutions, count_solutions
+from lazor_simulator import LazorSim
+from lazor_board import Board, BLOCKS, CODES, NAME_CODES, OPEN, LETTERS
+from lazor_table import TransitionTable, EDGE, EXIT
+from lazor_trace import trace_beams
+from lazor_candidates import iter_placements, count_placements
+from lazor_reach import split_open_cells
+from lazor_stats import SearchStats
+from lazor_symmetry import board_symmetries
+
+try:
+    import numpy
+    HAVE_NUMPY = True
+except ImportError:
+    HAVE_NUMPY = False
+
+
+def sample_board(targets=((2, 2),), blocks=None):
+    """
+    3x3 open board with one lazor starting on a cell corner, so it crosses
+    cell centres. Hitting (2, 2) needs a block at cell (2, 2) to send it back.
+    """
+    return {
+        "grid": [['o', 'o', 'o'] for _ in range(3)],
+        "blocks": dict({"A": 1, "B": 1, "C": 0}, **(blocks or {})),
+        "lazors": [{"position": (4, 4), "direction": (1, 1)}],
+        "targets": list(targets),
+    }
+
+
+def apply_placements(parsed, placements):
+    board = Board.from_grid(parsed["grid"])
+    for x, y, name in placements:
+        board.place(x, y, NAME_CODES[name])
+    return board
 
 
 class TestLazorSolver(unittest.TestCase):
@@ -96,5 +130,698 @@ class TestLazorSolver(unittest.TestCase):
                 os.remove(expected_txt)
 
 
+class SolutionAssertions:
+    def assertSolves(self, parsed, placements):
+        self.assertIsNotNone(placements)
+        self.assertEqual(len(placements), sum(parsed["blocks"].values()))
+        grid = apply_placements(parsed, placements)
+        self.assertTrue(LazorSim(grid, parsed["lazors"], parsed["targets"]).simulate())
+
+
+class TestSearchBackends(SolutionAssertions, unittest.TestCase):
+
+    def test_backtrack_finds_valid_solution(self):
+        parsed = sample_board()
+        placements, paths = solve_board(parsed)
+        self.assertSolves(parsed, placements)
+        self.assertEqual(len(paths), 1)
+
+    def test_backends_agree(self):
+        for targets in [((2, 2),), ((2, 2), (6, 6)), ((0, 6),)]:
+            parsed = sample_board(targets)
+            fast, _ = solve_board(parsed, backend="backtrack")
+            slow, _ = solve_board(parsed, backend="enumerate")
+            self.assertEqual(fast is None, slow is None, targets)
+            if fast is not None:
+                self.assertSolves(parsed, fast)
+
+    def test_parallel_matches_sequential(self):
+        parsed = sample_board(blocks={"C": 1})
+        for backend in ("backtrack", "enumerate"):
+            expected = solve_board(parsed, backend=backend)
+            got = solve_board(parsed, backend=backend, workers=2, deterministic=True)
+            self.assertEqual(got, expected)
+            placements, _ = solve_board(parsed, backend=backend, workers=2)
+            self.assertSolves(parsed, placements)
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            solve_board(sample_board(), backend="nope")
+
+
+class TestBatch(unittest.TestCase):
+    def test_batch_writes_manifest(self):
+        import json
+        import tempfile
+        from main import solve_batch
+        with tempfile.TemporaryDirectory() as folder:
+            with open(os.path.join(folder, "tiny.bff"), "w") as f:
+                f.write("GRID START\no o o\no o o\no o o\nGRID STOP\n"
+                        "A 1\nB 1\nL 4 4 1 1\nP (1, 1)\n")
+            entries = solve_batch(folder, workers=2, timeout=30)
+            with open(os.path.join(folder, "solve_manifest.json")) as f:
+                manifest = json.load(f)
+            self.assertEqual(manifest["boards"], entries)
+            self.assertEqual(entries[0]["status"], "solved")
+            self.assertGreater(entries[0]["candidates"], 0)
+            self.assertTrue(os.path.exists(os.path.join(folder, "tiny_solution.txt")))
+
+
+class TestStream(unittest.TestCase):
+    BOARDS = [
+        "# first\nGRID START\no o o\no x o\no o o\nGRID STOP\nA 1\nB 1\nL 4 4 1 1\nP (1, 1)\n",
+        "GRID START\nA o\no C\nGRID STOP\nC 2\nL 0 1 1 1\nL 2 3 -1 1\nP (2, 0)\nP (0, 1)\n",
+    ]
+
+    def test_matches_parse_bff(self):
+        import pickle
+        import tempfile
+        from lazor_stream import load_many, write_pack
+        with tempfile.TemporaryDirectory() as folder:
+            paths = []
+            for i, text in enumerate(self.BOARDS):
+                paths.append(os.path.join(folder, f"b{i}.bff"))
+                with open(paths[-1], "w") as f:
+                    f.write(text)
+            expected = [parse_bff(path) for path in paths]
+            pack = os.path.join(folder, "boards.pack")
+            self.assertEqual(write_pack(folder, pack), 2)
+            with open(os.path.join(folder, "boards.cat"), "w") as f:
+                f.write("".join(self.BOARDS))
+
+            for source in (folder, pack, os.path.join(folder, "boards.cat")):
+                boards = load_many([source])
+                self.assertEqual(len(boards), 2)
+                self.assertIn("unparsed", repr(boards[0]))
+                for board, parsed in zip(boards, expected):
+                    self.assertEqual({k: board[k] for k in parsed}, parsed)
+                    self.assertEqual(board["board"].cells, Board.from_grid(parsed["grid"]).cells)
+            self.assertEqual(load_many(pack)[1].name, "b1.bff")
+            self.assertEqual(pickle.loads(pickle.dumps(boards[1]))["targets"], expected[1]["targets"])
+
+    def test_benchmark_cleans_up(self):
+        import sys
+        import tempfile
+        from lazor_stream import benchmark
+        with tempfile.TemporaryDirectory() as folder:
+            with open(os.path.join(folder, "b.bff"), "w") as f:
+                f.write(self.BOARDS[0])
+            path = list(sys.path)
+            packs = set(os.listdir(tempfile.gettempdir()))
+            self.assertIn("pack (parsed)", benchmark(folder, repeat=1))
+            self.assertEqual(sys.path, path)
+            self.assertEqual(set(os.listdir(tempfile.gettempdir())) - packs, set())
+
+
+class TestGenerate(SolutionAssertions, unittest.TestCase):
+    def test_corpus_boards_are_solvable(self):
+        import tempfile
+        from lazor_bench import CORPUS
+        from lazor_generate import bff_text, make_board
+        for seed, (name, width, height, blocks, n_lazors, n_targets) in enumerate(CORPUS[:3]):
+            parsed = make_board(seed, width, height, blocks, n_lazors, n_targets)
+            self.assertEqual(len(parsed["targets"]), n_targets)
+            with tempfile.TemporaryDirectory() as folder:
+                path = os.path.join(folder, name + ".bff")
+                with open(path, "w") as f:
+                    f.write(bff_text(parsed))
+                self.assertEqual(parse_bff(path), parsed)
+            placements, _ = solve_board(parsed)
+            self.assertSolves(parsed, placements)
+
+    def test_known_solution_and_fixed_blocks(self):
+        from lazor_generate import make_board
+        parsed, placements = make_board(7, 6, 5, {"A": 3, "B": 1, "C": 1}, 2, 4,
+                                        mix="oooooxB", solution=True)
+        self.assertEqual(len(parsed["grid"]), 5)
+        self.assertEqual(len(placements), 5)
+        self.assertSolves(parsed, placements)
+        with self.assertRaises(ValueError):
+            make_board(0, 2, 2, {"A": 1}, 1, 9, attempts=20)
+
+
+class TestSolutionCache(unittest.TestCase):
+    def test_round_trip_and_verification(self):
+        import tempfile
+        from lazor_cache import SolutionCache, board_key
+        parsed = sample_board()
+        placements, paths = solve_board(parsed)
+        with tempfile.TemporaryDirectory() as folder:
+            with SolutionCache(os.path.join(folder, "cache.sqlite"), max_entries=2) as cache:
+                self.assertIsNone(cache.get(parsed))
+                cache.put(parsed, placements, paths)
+                self.assertEqual(cache.get(parsed), (placements, paths))
+
+                # Same board written differently hashes the same
+                reordered = dict(parsed, blocks={"C": 0, "B": 1, "A": 1})
+                self.assertEqual(board_key(reordered), board_key(parsed))
+
+                # A stored answer that no longer solves the board is dropped
+                wrong = [(0, 0, "ReflectBlock"), (1, 0, "OpaqueBlock")]
+                cache.put(parsed, wrong, [])
+                self.assertIsNone(cache.get(parsed))
+                self.assertEqual(len(cache), 0)
+
+                # Oldest entries are evicted past max_entries
+                for t in ((2, 2), (4, 4), (6, 6)):
+                    cache.put(sample_board(targets=(t,)), placements, paths)
+                self.assertEqual(len(cache), 2)
+
+
+class TestCandidates(unittest.TestCase):
+    def test_placements_are_distinct_and_complete(self):
+        import itertools
+        cells = [(0, 0), (1, 0), (2, 0), (0, 1), (1, 1)]
+        blocks = {"A": 2, "B": 1, "C": 1}
+        got = [frozenset(p) for p in iter_placements(cells, blocks)]
+        self.assertEqual(len(got), len(set(got)))
+
+        keys = "AABC"
+        brute = {frozenset(zip(pos, perm))
+                 for perm in itertools.permutations(keys)
+                 for pos in itertools.permutations(cells, len(keys))}
+        self.assertEqual(set(got), brute)
+        self.assertEqual(count_placements(len(cells), blocks), len(got))
+
+    def test_too_many_blocks(self):
+        self.assertEqual(list(iter_placements([(0, 0)], {"A": 2})), [])
+        self.assertEqual(count_placements(1, {"A": 2}), 0)
+
+    def test_parking(self):
+        cells, parking = [(0, 0), (1, 0), (2, 0)], [(0, 1), (1, 1)]
+        blocks = {"A": 2, "B": 1}
+        got = list(iter_placements(cells, blocks, parking=parking))
+        self.assertEqual(len(got), count_placements(len(cells), blocks, len(parking)))
+        # Parked blocks fill the parking cells in order, keys sorted
+        for placement in got:
+            parked = [pair for pair in placement if pair[0] in parking]
+            self.assertEqual([cell for cell, _ in parked], parking[:len(parked)])
+            self.assertEqual(parked, sorted(parked, key=lambda pair: pair[1]))
+        self.assertIn(((0, 1), "A"), got[-1])
+        shards = [p for i in range(len(cells)) for p in iter_placements(cells, blocks, i, parking)]
+        self.assertEqual(shards, got)
+
+    def test_split_open_cells(self):
+        # Blocks only send the lazor back along its diagonal
+        relevant, parking = split_open_cells(Board(3, 3), sample_board()["lazors"], {"A": 1, "C": 1})
+        self.assertEqual(relevant, [(0, 0), (1, 1), (2, 2)])
+        self.assertEqual(len(parking), 6)
+
+
+class TestSymmetry(SolutionAssertions, unittest.TestCase):
+    def mirrored_board(self, targets):
+        parsed = sample_board(targets)
+        parsed["lazors"] = [{"position": (2, 0), "direction": (1, 1)},
+                            {"position": (4, 0), "direction": (-1, 1)}]
+        return parsed
+
+    def test_detects_symmetries(self):
+        parsed = sample_board()
+        self.assertEqual([s.name for s in board_symmetries(parsed)], ["transpose"])
+        parsed["grid"][1][0] = 'x'
+        self.assertEqual(board_symmetries(parsed), [])
+        parsed = self.mirrored_board([(1, 0), (5, 0)])
+        self.assertEqual([s.name for s in board_symmetries(parsed)], ["mirror-x"])
+
+    def test_pruning_is_counted(self):
+        parsed = self.mirrored_board([(1, 0), (5, 0)])
+        stats = SearchStats()
+        self.assertEqual(solve_board(parsed, backend="enumerate", stats=stats), (None, []))
+        self.assertGreater(stats.pruned_symmetry, 0)
+        self.assertGreater(stats.pruned_irrelevant, 0)
+        self.assertEqual(stats.candidates + stats.pruned_symmetry + stats.pruned_irrelevant,
+                         count_placements(9, parsed["blocks"]))
+        self.assertEqual(stats.search_space, count_placements(9, parsed["blocks"]))
+        self.assertEqual(stats.reduced_space, stats.search_space - stats.pruned_irrelevant)
+
+    def test_plain_enumeration_prunes_nothing(self):
+        parsed = self.mirrored_board([(1, 0), (5, 0)])
+        stats = SearchStats()
+        self.assertEqual(solve_board(parsed, backend="plain", stats=stats), (None, []))
+        self.assertEqual(stats.pruned, 0)
+        self.assertEqual(stats.candidates, count_placements(9, parsed["blocks"]))
+        parsed = self.mirrored_board([(2, 0), (4, 0)])
+        placements, _ = solve_board(parsed, backend="plain", workers=2)
+        self.assertSolves(parsed, placements)
+
+    def test_reduced_search_still_solves(self):
+        parsed = self.mirrored_board([(2, 0), (4, 0)])
+        for backend in ("backtrack", "enumerate"):
+            placements, _ = solve_board(parsed, backend=backend)
+            self.assertSolves(parsed, placements)
+
+
+class TestCheckpoint(unittest.TestCase):
+    def test_resume_after_interruption(self):
+        import tempfile
+        from lazor_checkpoint import Checkpoint
+        from lazor_generate import make_board
+
+        class Interrupted(Exception):
+            pass
+
+        class Crashing(Checkpoint):
+            def save(self, position, stats=None):
+                super().save(position, stats)
+                if self.saves == 3:
+                    raise Interrupted
+
+        boards = {
+            "backtrack": make_board(2, 8, 8, {"A": 6, "B": 2, "C": 2}, 3, 8),
+            "enumerate": make_board(40, 6, 6, {"A": 4, "B": 2, "C": 1}, 2, 5),
+        }
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "board.checkpoint.json")
+            for backend, parsed in boards.items():
+                fresh = SearchStats()
+                expected = solve_board(parsed, backend=backend, stats=fresh)
+                with self.assertRaises(Interrupted):
+                    solve_board(parsed, backend=backend, stats=SearchStats(),
+                                checkpoint=Crashing(path, parsed, backend, interval=0))
+                checkpoint = Checkpoint(path, parsed, backend)
+                self.assertIsNotNone(checkpoint.position)
+                stats = SearchStats()
+                self.assertEqual(solve_board(parsed, backend=backend, stats=stats,
+                                             checkpoint=checkpoint), expected)
+                self.assertGreater(stats.candidates, 0)
+                for size in ("search_space", "reduced_space", "pruned_irrelevant"):
+                    self.assertEqual(getattr(stats, size), getattr(fresh, size), size)
+                self.assertFalse(os.path.exists(path))
+
+    def test_solve_bff_resume(self):
+        import tempfile
+        from lazor_checkpoint import Checkpoint
+        with tempfile.TemporaryDirectory() as folder:
+            bff = os.path.join(folder, "tiny.bff")
+            with open(bff, "w") as f:
+                f.write("GRID START\no o o\no o o\no o o\nGRID STOP\n"
+                        "A 1\nB 1\nL 4 4 1 1\nP (1, 1)\n")
+            placements, _ = solve_bff(bff, resume=True)
+            self.assertIsNotNone(placements)
+            self.assertFalse(os.path.exists(os.path.join(folder, "tiny.checkpoint.json")))
+            # A checkpoint only resumes the board and backend it was saved for
+            other = os.path.join(folder, "other.json")
+            Checkpoint(other, sample_board(targets=((6, 6),)), "backtrack").save([0])
+            with self.assertRaises(ValueError):
+                solve_bff(bff, resume=other)
+            with self.assertRaises(ValueError):
+                solve_board(sample_board(), backend="enumerate",
+                            checkpoint=Checkpoint(other, sample_board(), "backtrack"))
+
+    def test_cache_hit_removes_checkpoint(self):
+        import tempfile
+        from lazor_cache import SolutionCache
+        from lazor_checkpoint import Checkpoint
+        with tempfile.TemporaryDirectory() as folder:
+            bff = os.path.join(folder, "tiny.bff")
+            with open(bff, "w") as f:
+                f.write("GRID START\no o o\no o o\no o o\nGRID STOP\n"
+                        "A 1\nB 1\nL 4 4 1 1\nP (1, 1)\n")
+            with SolutionCache(os.path.join(folder, "cache.sqlite")) as cache:
+                solve_bff(bff, cache=cache)
+                stale = os.path.join(folder, "tiny.checkpoint.json")
+                Checkpoint(stale, parse_bff(bff), "backtrack").save([0])
+                stats = SearchStats()
+                placements, _ = solve_bff(bff, cache=cache, resume=True, stats=stats)
+            self.assertIsNotNone(placements)
+            self.assertEqual(stats.candidates, 0)  # answered from the cache
+            self.assertFalse(os.path.exists(stale))
+
+
+class TestSearchStats(SolutionAssertions, unittest.TestCase):
+    def test_solve_with_stats(self):
+        parsed = sample_board(blocks={"C": 1})
+        for backend in ("backtrack", "enumerate"):
+            placements, paths, stats = solve_with_stats(parsed, backend=backend)
+            self.assertSolves(parsed, placements)
+            self.assertGreater(stats.simulations, 0)
+            self.assertGreater(stats.beam_steps, 0)
+            self.assertGreaterEqual(stats.generated, stats.candidates)
+            self.assertTrue({"setup", "search", "paths"} <= set(stats.seconds))
+            self.assertIn("beam steps", stats.summary())
+
+    def test_merge(self):
+        a, b = SearchStats(), SearchStats()
+        a.candidates, b.candidates = 2, 3
+        a.seconds["search"], b.seconds["search"] = 1.0, 0.5
+        a.merge(b)
+        self.assertEqual(a.candidates, 5)
+        self.assertEqual(a.as_dict()["seconds"], {"search": 1.5})
+
+
+class TestTargetSearch(SolutionAssertions, unittest.TestCase):
+    def test_distances(self):
+        from lazor_target import target_distances
+        board = Board(3, 3)
+        table = TransitionTable.for_board(board)
+        dist = target_distances(board, [(2, 2)], {"A": 1, "B": 1, "C": 0}, table)[(2, 2)]
+        # Heading at (2, 2) costs nothing; heading away needs a block to turn back
+        self.assertEqual(dist[table.state(1, 1, (1, 1))], 0)
+        self.assertEqual(dist[table.state(5, 5, (-1, -1))], 0)
+        self.assertEqual(dist[table.state(5, 5, (1, 1))], 1)
+
+    def test_solves_with_few_candidates(self):
+        from lazor_generate import make_board
+        # Plain backtracking simulates tens of thousands of boards here
+        parsed = make_board(304, 14, 14, {"A": 12, "B": 4, "C": 3}, 6, 14)
+        stats = SearchStats()
+        placements, _ = solve_board(parsed, backend="target", stats=stats)
+        self.assertSolves(parsed, placements)
+        self.assertLess(stats.candidates, 100)
+        self.assertEqual(solve_board(sample_board([(2, 2), (7, 7)]), backend="target"), (None, []))
+
+
+class TestSatBackend(SolutionAssertions, unittest.TestCase):
+    def test_sat_solver(self):
+        from lazor_sat import SatSolver, at_most
+        solver = SatSolver()
+        x = [solver.new_var() for _ in range(4)]
+        solver.add_clause([x[0], x[1]])
+        solver.add_clause([-x[0], x[2]])
+        solver.add_clause([-x[1], x[2]])
+        at_most(solver, x, 2)
+        model = solver.solve()
+        self.assertTrue(model[x[2]] and (model[x[0]] or model[x[1]]))
+        self.assertLessEqual(sum(model[v] for v in x), 2)
+        # Three pigeons, two holes
+        solver = SatSolver()
+        holes = [[solver.new_var() for _ in range(2)] for _ in range(3)]
+        for pigeon in holes:
+            solver.add_clause(pigeon)
+        for h in range(2):
+            at_most(solver, [pigeon[h] for pigeon in holes], 1)
+        self.assertFalse(solver.solve())
+
+    def test_sat_backend(self):
+        from lazor_generate import make_board
+        for parsed in (sample_board(), make_board(304, 14, 14, {"A": 12, "B": 4, "C": 3}, 6, 14)):
+            placements, paths = solve_board(parsed, backend="sat")
+            self.assertSolves(parsed, placements)
+            self.assertEqual(len(paths), len(parsed["lazors"]))
+        self.assertEqual(solve_board(sample_board([(2, 2), (7, 7)]), backend="sat"), (None, []))
+
+
+class TestAnytime(SolutionAssertions, unittest.TestCase):
+    def test_solves_and_reports_partial(self):
+        from lazor_anytime import best_first
+        parsed = sample_board(targets=((2, 2),))
+        result = best_first(parsed)
+        self.assertTrue(result.solved)
+        self.assertEqual(result.hit_ratio, 1.0)
+        self.assertSolves(parsed, result.placements)
+
+        # Needs a refract block there are none of: half the targets at best
+        result = best_first(sample_board(targets=((2, 2), (6, 6))))
+        self.assertFalse(result.solved)
+        self.assertTrue(result.exhausted)
+        self.assertEqual(result.hit_ratio, 0.5)
+
+    def test_budget(self):
+        from lazor_anytime import best_first
+        from lazor_generate import make_board
+        parsed = make_board(304, 14, 14, {"A": 12, "B": 4, "C": 3}, 6, 14)
+        result = best_first(parsed, max_nodes=10)
+        self.assertEqual(result.nodes, 10)
+        self.assertFalse(result.solved or result.exhausted)
+        self.assertGreater(result.hit_ratio, 0)
+        self.assertLess(result.hit_ratio, 1)
+        placements, _ = solve_board(parsed, backend="anytime")
+        self.assertSolves(parsed, placements)
+
+
+class TestAllSolutions(SolutionAssertions, unittest.TestCase):
+    def test_matches_brute_force(self):
+        parsed = sample_board([(2, 2)], {"B": 0, "C": 1})
+        board = Board.from_grid(parsed["grid"])
+        expected = []
+        for placement in iter_placements(board.open_cells(), parsed["blocks"]):
+            grid = board.copy()
+            for (x, y), key in placement:
+                grid.place(x, y, CODES[key])
+            if LazorSim(grid, parsed["lazors"], parsed["targets"]).simulate():
+                expected.append(sorted((x, y, type(BLOCKS[CODES[key]]).__name__)
+                                       for (x, y), key in placement))
+        self.assertGreater(len(expected), 1)
+        for backend in ("sat", "enumerate"):
+            solutions = list(iter_solutions(parsed, backend=backend))
+            self.assertEqual(sorted(solutions), sorted(expected))
+            self.assertEqual(count_solutions(parsed, backend=backend), len(expected))
+            self.assertEqual(count_solutions(parsed, stop_at=1, backend=backend), 1)
+        stopped = iter_solutions(parsed, backend="enumerate", should_stop=lambda: True)
+        self.assertEqual(list(stopped), [])
+
+    def test_lazy_and_unique(self):
+        from itertools import islice
+        from lazor_generate import make_board
+        parsed = make_board(300, 20, 20, {"A": 18, "B": 6, "C": 4}, 8, 20)
+        for placements in islice(iter_solutions(parsed), 3):
+            self.assertSolves(parsed, placements)
+        self.assertEqual(count_solutions(parsed, stop_at=2), 2)
+        self.assertEqual(count_solutions(sample_board([(2, 2), (7, 7)])), 0)
+
+
+class TestTransposition(unittest.TestCase):
+    def test_eviction(self):
+        from lazor_transposition import TranspositionTable, DEPTH
+        lru = TranspositionTable(2)
+        lru.put(1, 0)
+        lru.put(2, 0)
+        lru.get(1)
+        lru.put(3, 0)
+        self.assertIsNone(lru.get(2))
+        self.assertIsNotNone(lru.get(1))
+        deep = TranspositionTable(4, DEPTH)
+        deep.put(1, 3)
+        deep.put(5, 1)  # same slot, shallower: ignored
+        self.assertEqual(deep.get(1), 3)
+        self.assertIsNone(deep.get(5))
+
+    def test_zobrist_ignores_order(self):
+        from lazor_transposition import Zobrist
+        z = Zobrist(9, len(LETTERS))
+        a, b = z.key(0, CODES["A"]), z.key(4, CODES["C"])
+        self.assertEqual(a ^ b, b ^ a)
+        self.assertNotEqual(a, z.key(0, CODES["B"]))
+
+    def test_search_skips_transpositions(self):
+        from lazor_generate import make_board
+        from lazor_search import BacktrackSearch
+        # A deep search: the same blocks come up again in other orders
+        parsed = make_board(304, 14, 14, {"A": 12, "B": 4, "C": 3}, 6, 14)
+        stats = SearchStats()
+        search = BacktrackSearch(parsed, stats=stats, should_stop=lambda: stats.candidates >= 1000)
+        self.assertIsNone(search.solve())
+        self.assertGreater(stats.pruned_transposition, 0)
+        self.assertGreater(len(search.transpositions), 0)
+
+
+class TestIncrementalSim(unittest.TestCase):
+    def test_matches_full_trace_after_edits(self):
+        import random
+        rng = random.Random(7)
+        w, h = 4, 4
+        points = [(x, y) for x in range(2 * w + 1) for y in range(2 * h + 1)]
+        for _ in range(20):
+            grid = [[rng.choice('oox') for _ in range(w)] for _ in range(h)]
+            lazors = [{"position": (rng.randrange(0, 2 * w + 1, 2), rng.randrange(0, 2 * h + 1, 2)),
+                       "direction": (rng.choice((-1, 1)), rng.choice((-1, 1)))}
+                      for _ in range(2)]
+            sim = LazorSim(Board.from_grid(grid), lazors, points, incremental=True)
+            for _ in range(15):
+                x, y = rng.randrange(w), rng.randrange(h)
+                sim.set_cell(x, y, rng.choice(list(BLOCKS) + [OPEN]))
+                sim.simulate()
+                full = LazorSim(sim.board.to_grid(), lazors, points)
+                full.simulate()
+                self.assertEqual(sim.hit_targets, full.hit_targets)
+                self.assertEqual(sim.crossed, full.crossed)
+
+
+class TestTraceBeams(unittest.TestCase):
+    def test_many_refract_blocks(self):
+        grid = [['C'] * 8 for _ in range(8)]
+        lazors = [{"position": (0, 0), "direction": (1, 1)}]
+        targets = [(x, y) for x in range(17) for y in range(17)]
+        sim = LazorSim(grid, lazors, targets)
+        sim.simulate()
+        self.assertFalse(sim.truncated)
+        result = LazorSim(grid, lazors, targets).run(stop_early=False)
+        self.assertEqual(sim.hit_targets, set(sim.targets_in(result.hit_mask)))
+        self.assertEqual(len(sim.get_paths()), 1)
+
+    def test_limits(self):
+        grid = [['C'] * 4 for _ in range(4)]
+        lazors = [{"position": (0, 0), "direction": (1, 1)}]
+        sim = LazorSim(grid, lazors, [(8, 8)], max_steps=5)
+        sim.simulate()
+        self.assertTrue(sim.truncated)
+        table = TransitionTable.for_board(sim.board)
+        trace = trace_beams(table, sim.board.cells, [((0, 0), table.state(1, 1, (1, 1)))], max_beams=2)
+        self.assertTrue(trace.truncated)
+        self.assertEqual(len(trace.beams), 2)
+
+
+class TestJumpIndex(unittest.TestCase):
+    def test_matches_full_trace(self):
+        import random
+        from lazor_generate import make_board
+        for seed in range(5):
+            parsed = make_board(seed, 7, 6, {"A": 3, "B": 1, "C": 2}, 2, 3, mix="oooxxABC")
+            rng = random.Random(seed)
+            board = Board.from_grid(parsed["grid"])
+            full = LazorSim(board.copy(), parsed["lazors"], parsed["targets"])
+            jump = LazorSim(board.copy(), parsed["lazors"], parsed["targets"], jumps=True)
+            cells = [(x, y) for y in range(6) for x in range(7)]
+            for _ in range(30):
+                self.assertEqual(full.simulate(), jump.simulate())
+                self.assertEqual(full.hit_targets, jump.hit_targets)
+                self.assertEqual(full.crossed, jump.crossed)
+                # Includes cells that were fixed when the index was built
+                x, y = rng.choice(cells)
+                code = rng.choice([OPEN, CODES["A"], CODES["B"], CODES["C"]])
+                full.set_cell(x, y, code)
+                jump.set_cell(x, y, code)
+
+
+class TestBitBoard(SolutionAssertions, unittest.TestCase):
+    def test_matches_full_trace(self):
+        import random
+        from lazor_bitboard import BitBoard
+        from lazor_generate import make_board
+        for seed in range(5):
+            parsed = make_board(seed, 6, 7, {"A": 3, "B": 1, "C": 2}, 2, 3, mix="oooxxABC")
+            rng = random.Random(seed)
+            board = Board.from_grid(parsed["grid"])
+            sim = LazorSim(board.copy(), parsed["lazors"], parsed["targets"])
+            bits = BitBoard(board.copy(), parsed["lazors"], parsed["targets"])
+            for _ in range(30):
+                self.assertEqual(sim.simulate(), bits.simulate())
+                self.assertEqual(sim.hit_targets, bits.hit_targets())
+                self.assertEqual(sim.crossed, bits.crossed())
+                self.assertEqual(len(sim._trace().visited), bits.beam_steps())
+                x, y = rng.randrange(6), rng.randrange(7)
+                code = rng.choice([OPEN, CODES["A"], CODES["B"], CODES["C"]])
+                sim.set_cell(x, y, code)
+                bits.set_cell(x, y, code)
+
+    def test_backend(self):
+        parsed = sample_board(targets=((2, 2), (6, 6)), blocks={"C": 1})
+        placements, _ = solve_board(parsed, backend="bitboard")
+        self.assertSolves(parsed, placements)
+
+
+class TestSimResult(unittest.TestCase):
+    def test_run_matches_simulate(self):
+        parsed = sample_board(targets=((2, 2), (0, 0), (6, 6)))
+        board = Board.from_grid(parsed["grid"])
+        board.place(2, 2, CODES['C'])
+        sim = LazorSim(board, parsed["lazors"], parsed["targets"])
+        full = sim.run(stop_early=False)
+        self.assertTrue(full.solved)
+        self.assertEqual(full.hit_mask, sim.full_mask)
+        self.assertEqual(full.beams, 2)  # the refract block splits the beam once
+
+        early = sim.run()
+        self.assertTrue(early.solved)
+        self.assertLessEqual(early.steps, full.steps)
+        self.assertEqual(sim.simulate(), full.solved)
+
+    def test_unreachable_targets(self):
+        parsed = sample_board(targets=((2, 2), (0, 6)))
+        sim = LazorSim(parsed["grid"], parsed["lazors"], parsed["targets"])
+        result = sim.run()
+        self.assertFalse(result.solved)
+        self.assertEqual(sim.targets_in(result.unreachable_mask), [(0, 6), (2, 2)])
+        result = sim.run(inventory=parsed["blocks"])
+        self.assertEqual(sim.targets_in(result.unreachable_mask), [(0, 6)])
+
+    def test_incremental_run_matches(self):
+        parsed = sample_board(targets=((2, 2), (6, 6), (0, 6)), blocks={"C": 1})
+        full = LazorSim(parsed["grid"], parsed["lazors"], parsed["targets"])
+        inc = LazorSim(parsed["grid"], parsed["lazors"], parsed["targets"], incremental=True)
+        for code in (OPEN, CODES["A"], CODES["C"], CODES["B"]):
+            full.set_cell(2, 2, code)
+            inc.set_cell(2, 2, code)
+            a = full.run(stop_early=False, inventory={"A": 1})
+            b = inc.run(stop_early=False, inventory={"A": 1})
+            self.assertEqual(a[:3], b[:3])
+            self.assertEqual(full.crossed, inc.crossed)
+            self.assertEqual(full.hit_targets, inc.hit_targets)
+
+
+@unittest.skipUnless(HAVE_NUMPY, "numpy not installed")
+class TestBatchSimulator(SolutionAssertions, unittest.TestCase):
+    def test_matches_lazorsim(self):
+        from lazor_batch import placement_grids, simulate_batch
+        parsed = sample_board(targets=((2, 2), (6, 6)))
+        board = Board.from_grid(parsed["grid"])
+        placements = list(iter_placements(board.open_cells(), {"A": 1, "C": 1}))
+        solved = simulate_batch(placement_grids(board, placements),
+                                parsed["lazors"], parsed["targets"])
+        for placement, got in zip(placements, solved):
+            sim = LazorSim(board.copy(), parsed["lazors"], parsed["targets"])
+            for (x, y), key in placement:
+                sim.set_cell(x, y, CODES[key])
+            self.assertEqual(bool(got), sim.simulate(), placement)
+
+    def test_batch_backend(self):
+        parsed = sample_board()
+        placements, _ = solve_board(parsed, backend="batch")
+        self.assertSolves(parsed, placements)
+
+    def test_many_targets_fall_back(self):
+        # More targets than the int64 hit masks hold
+        lazors = ([{"position": (0, y), "direction": (1, 1)} for y in range(11)]
+                  + [{"position": (x, 0), "direction": (1, 1)} for x in range(1, 11)])
+        targets = [(x, y) for x in range(1, 11) for y in range(1, 11)][:70]
+        parsed = {"grid": [['o'] * 5 for _ in range(5)], "blocks": {"A": 0, "B": 0, "C": 0},
+                  "lazors": lazors, "targets": targets}
+        self.assertEqual(solve_board(parsed, backend="batch"),
+                         solve_board(parsed, backend="enumerate"))
+        parsed["targets"].append((0, 10))  # never hit
+        self.assertEqual(solve_board(parsed, backend="batch"), (None, []))
+
+
+class TestBoard(unittest.TestCase):
+    def test_round_trip_and_place(self):
+        grid = [['o', 'x', 'A'], ['B', 'C', 'o']]
+        board = Board.from_grid(grid)
+        self.assertEqual(board.to_grid(), grid)
+        self.assertEqual(board.open_cells(), [(0, 0), (2, 1)])
+
+        board.place(2, 1, CODES['C'])
+        self.assertEqual(LETTERS[board.get(2, 1)], 'C')
+        board.unplace(2, 1)
+        self.assertEqual(board.get(2, 1), OPEN)
+
+    def test_block_instances_map_to_codes(self):
+        board = Board.from_grid([list(BLOCKS.values())])
+        self.assertEqual(list(board.cells), list(BLOCKS))
+
+
+class TestTransitionTable(unittest.TestCase):
+    def test_centre_moves(self):
+        table = TransitionTable(3, 3)
+        s = table.state(5, 5, (1, 1))  # centre of cell (2, 2)
+        self.assertEqual(table.points[s], (5, 5))
+        self.assertEqual(table.probe[s], 2 * 3 + 2)
+        straight, back = table.state(6, 6, (1, 1)), table.state(4, 4, (-1, -1))
+        self.assertEqual(table.moves[s][OPEN], (straight,))
+        self.assertEqual(table.moves[s][CODES['A']], (back,))
+        self.assertEqual(table.moves[s][CODES['B']], ())
+        self.assertEqual(table.moves[s][CODES['C']], (straight, back))
+        self.assertEqual(table.probe[table.state(7, 7, (1, 1))], EXIT)
+
+    def test_edge_moves(self):
+        table = TransitionTable(3, 3, physics=EDGE)
+        s = table.state(2, 3, (1, 1))  # on the left edge of cell (1, 1)
+        self.assertEqual(table.probe[s], 1 * 3 + 1)
+        self.assertEqual(table.moves[s][CODES['A']], (table.state(1, 4, (-1, 1)),))
+        self.assertEqual(table.probe[table.state(6, 3, (1, 1))], EXIT)
+
+    def test_shared_per_size(self):
+        self.assertIs(TransitionTable.for_board(Board(4, 2)), TransitionTable.for_board(Board(4, 2)))
+
+
 if __name__ == '__main__':
     unittest.main()